@@ -9,5 +9,7 @@ admin.site.register(Table)
 admin.site.register(Type)
 admin.site.register(Food)
 admin.site.register(Order)
+admin.site.register(OrderLine)
 admin.site.register(Comment)
-admin.site.register(Unavailable)
\ No newline at end of file
+admin.site.register(Unavailable)
+admin.site.register(Task)
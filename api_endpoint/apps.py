@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ApiEndpointConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api_endpoint'
+
+    def ready(self):
+        from . import signals
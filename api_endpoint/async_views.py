@@ -0,0 +1,202 @@
+import inspect
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.http import Http404, StreamingHttpResponse
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .models import *
+from .serializers import *
+from .pagination import KeysetPagination, FoodPagination
+from .cache import HTTPCacheMixin, acached_menu_response
+from .filters import FilterError, RestaurantFilters, TableFilters, TypeFilters, FoodFilters, CommentFilters
+from .availability import availability_index
+from .orders import order_queryset, aget_ordered_food_detail
+from .events import channels_for, get_event_broker, stream
+from .routers import use_primary
+
+# Async variants of the read endpoints, served under /api/async/. Under an
+# ASGI server a request only holds a thread while it is in the ORM, so
+# menu and comment browsing can overlap their database I/O. Responses are
+# the same as the synchronous views'.
+
+
+async def fetch(queryset):
+    return [obj async for obj in queryset]
+
+
+class AsyncAPIView(APIView):
+    # APIView whose handlers are coroutines. Authentication, permission and
+    # throttle checks may read the database, so they run via sync_to_async.
+    pagination_class = None
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+            response = handler(request, *args, **kwargs)
+            # OPTIONS is still APIView's synchronous metadata handler.
+            if inspect.isawaitable(response):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def paginate(self, queryset):
+        # Cursor pagination evaluates the page itself.
+        self.paginator = self.pagination_class()
+        return await sync_to_async(self.paginator.paginate_queryset)(queryset, self.request, view=self)
+
+
+class AsyncRestaurantView(HTTPCacheMixin, AsyncAPIView):
+    permission_classes = [IsAuthenticated]
+
+    async def get(self, request):
+        try:
+            filters = RestaurantFilters.from_request(request)
+        except FilterError as e:
+            return Response({'error': e.message}, status=status.HTTP_400_BAD_REQUEST)
+        restaurants = await fetch(filters.apply(RestaurantSerializer.setup_eager_loading(Restaurant.objects.all())))
+        return Response(RestaurantSerializer(restaurants, many=True).data, status=status.HTTP_200_OK)
+
+
+class AsyncTableView(AsyncAPIView):
+    permission_classes = [IsAuthenticated]
+
+    async def get(self, request):
+        try:
+            filters = TableFilters.from_request(request)
+        except FilterError as e:
+            return Response({'error': e.message}, status=status.HTTP_400_BAD_REQUEST)
+        tables = await fetch(filters.apply(TableSerializer.setup_eager_loading(Table.objects.all())))
+        return Response({'table': TableSerializer(tables, many=True).data}, status=status.HTTP_200_OK)
+
+
+class AsyncTypeView(HTTPCacheMixin, AsyncAPIView):
+    permission_classes = [IsAuthenticated]
+
+    async def get(self, request):
+        try:
+            filters = TypeFilters.from_request(request)
+        except FilterError as e:
+            return Response({'error': e.message}, status=status.HTTP_400_BAD_REQUEST)
+        return await acached_menu_response(request, 'type', lambda: self.build_list(filters))
+
+    async def build_list(self, filters):
+        types = await fetch(filters.apply(TypeSerializer.setup_eager_loading(Type.objects.all())))
+        return Response(TypeSerializer(types, many=True).data, status=status.HTTP_200_OK)
+
+
+class AsyncFoodView(HTTPCacheMixin, AsyncAPIView):
+    permission_classes = [IsAuthenticated]
+    pagination_class = FoodPagination
+
+    async def get(self, request):
+        return await acached_menu_response(request, 'food', lambda: self.build_list(request))
+
+    async def build_list(self, request):
+        try:
+            filters = FoodFilters.from_request(request)
+        except FilterError as e:
+            return Response({'error': e.message}, status=status.HTTP_400_BAD_REQUEST)
+        queryset = filters.apply(FoodSerializer.setup_eager_loading(Food.objects.all()))
+        data = food_rows.to_representation(await self.paginate(food_rows.values(queryset)))
+        if filters.restaurant_id:
+            available = await sync_to_async(availability_index.available_foods)(filters.restaurant_id, [food['id'] for food in data])
+            for food in data:
+                food['available'] = food['id'] in available
+        return Response(self.paginator.get_paginated_data('food', data), status=status.HTTP_200_OK)
+
+
+class AsyncCommentView(AsyncAPIView):
+    permission_classes = []
+    pagination_class = KeysetPagination
+
+    async def get(self, request):
+        try:
+            filters = CommentFilters.from_request(request)
+        except FilterError as e:
+            return Response({'error': e.message}, status=status.HTTP_400_BAD_REQUEST)
+        if filters.restaurant_id and not await Restaurant.objects.filter(id=filters.restaurant_id).aexists():
+            return Response({'error': f'Restaurant with id {filters.restaurant_id} does not exist.'}, status=status.HTTP_404_NOT_FOUND)
+        if filters.user_id and not await User.objects.filter(id=filters.user_id).aexists():
+            return Response({'error': f'User with id {filters.user_id} does not exist.'}, status=status.HTTP_404_NOT_FOUND)
+        queryset = filters.apply(CommentSerializer.setup_eager_loading(Comment.objects.all()))
+        data = comment_rows.to_representation(await self.paginate(comment_rows.values(queryset)))
+        return Response(self.paginator.get_paginated_data('comment', data), status=status.HTTP_200_OK)
+
+
+class AsyncSingleOrderView(AsyncAPIView):
+    permission_classes = [IsAuthenticated]
+
+    async def get(self, request, pk):
+        order = await order_queryset().filter(pk=pk).afirst()
+        if order is None:
+            raise Http404('No Order matches the given query.')
+        if order.user_id != request.user.id and not request.user.is_superuser:
+            return Response({'error': 'Only superuser can view orders.'}, status=status.HTTP_403_FORBIDDEN)
+        data = {
+            'order': OrderSerializer(order).data,
+            'ordered_food': await aget_ordered_food_detail(order)
+        }
+        return Response(data, status=status.HTTP_200_OK)
+
+
+class EventStreamView(AsyncAPIView):
+    # Server-Sent Events for one restaurant's tables and orders or for one
+    # order: a snapshot first, then table.claimed/released/updated/deleted
+    # and order.items_added/item_removed/completed events as they commit.
+    permission_classes = [IsAuthenticated]
+
+    def perform_content_negotiation(self, request, force=False):
+        # EventSource accepts only text/event-stream; errors are still JSON.
+        return super().perform_content_negotiation(request, force=True)
+
+    async def get(self, request):
+        try:
+            restaurant_id = int(request.query_params.get('restaurant_id', 0))
+            order_id = int(request.query_params.get('order_id', 0))
+        except ValueError:
+            return Response({'error': 'restaurant_id and order_id must be int.'}, status=status.HTTP_400_BAD_REQUEST)
+        if bool(restaurant_id) == bool(order_id):
+            return Response({'error': 'Either restaurant_id or order_id is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        if order_id:
+            order = await order_queryset().filter(id=order_id).afirst()
+            if order is None:
+                return Response({'error': 'Order does not exist.'}, status=status.HTTP_404_NOT_FOUND)
+            if order.user_id != request.user.id and not request.user.is_superuser:
+                return Response({'error': 'Only superuser can view orders.'}, status=status.HTTP_403_FORBIDDEN)
+        elif not await Restaurant.objects.filter(id=restaurant_id).aexists():
+            return Response({'error': f'Restaurant with id {restaurant_id} does not exist.'}, status=status.HTTP_404_NOT_FOUND)
+
+        subscription = get_event_broker().subscribe(channels_for(restaurant_id, order_id))
+        try:
+            # Events come from primary commits, so the snapshot does too.
+            with use_primary():
+                snapshot = await self.snapshot(restaurant_id, order_id)
+        except BaseException:
+            subscription.close()
+            raise
+        response = StreamingHttpResponse(stream(subscription, snapshot), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    async def snapshot(self, restaurant_id, order_id):
+        if order_id:
+            order = await order_queryset().aget(id=order_id)
+            return {'order': OrderSerializer(order).data, 'ordered_food': await aget_ordered_food_detail(order)}
+        tables = await fetch(TableSerializer.setup_eager_loading(Table.objects.filter(restaurant_id=restaurant_id)).order_by('id'))
+        return {'table': TableSerializer(tables, many=True).data}
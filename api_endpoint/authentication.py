@@ -0,0 +1,95 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework.authentication import TokenAuthentication
+
+
+class TokenCache:
+    # token key -> (user, token) for this process, least recently used first.
+    # Entries expire after TOKEN_CACHE_TTL seconds; token deletes (logout)
+    # and user saves (deactivation, superuser changes) drop them at once
+    # through signals. Queryset .update()s send no signals, so the TTL also
+    # bounds how long another process may still accept a revoked token.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        # Bumped by every invalidation, so a fill that read the database
+        # before a concurrent logout/deactivation is not stored.
+        self.generation = 0
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[2] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        user, token, _ = entry
+        # Each request gets its own instance to change or cache relations on.
+        return copy.copy(user), token
+
+    def set(self, key, user, token, generation):
+        ttl = getattr(settings, 'TOKEN_CACHE_TTL', 60)
+        size = getattr(settings, 'TOKEN_CACHE_SIZE', 10000)
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries[key] = (copy.copy(user), token, time.monotonic()+ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self.generation += 1
+            if self._entries.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            self.generation += 1
+            for key in [key for key, (user, _, _) in self._entries.items() if user.id == user_id]:
+                del self._entries[key]
+                self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits+self.misses
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits/lookups, 4) if lookups else None,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = self.invalidations = 0
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    # TokenAuthentication without the token+user query on repeat requests.
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is not None:
+            return cached
+        generation = token_cache.generation
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, user, token, generation)
+        return user, token
@@ -0,0 +1,68 @@
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+
+from .models import *
+from .cache import menu_cache
+from .routers import use_primary
+
+VERSION_KEY = 'availability:version'
+
+
+def availability_version():
+    return menu_cache().get_or_set(VERSION_KEY, time.time_ns, None)
+
+
+def bump_availability_version():
+    try:
+        menu_cache().incr(VERSION_KEY)
+    except ValueError:
+        menu_cache().set(VERSION_KEY, time.time_ns(), None)
+
+
+class AvailabilityIndex:
+    # Unavailable food ids per restaurant, loaded with one query. The index is
+    # rebuilt when its version moves, which only Unavailable saves/deletes
+    # bump (not every menu or rating change). The version lives in the menu
+    # cache, which is per process unless it is a shared backend, so the index
+    # is also rebuilt every AVAILABILITY_INDEX_TTL seconds: changes made by
+    # other processes show up within that time.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._expires = 0
+        self._unavailable = {}
+
+    def _current(self):
+        version = availability_version()
+        with self._lock:
+            if version != self._version or time.monotonic() >= self._expires:
+                unavailable = defaultdict(set)
+                with use_primary():
+                    for restaurant_id, food_id in Unavailable.objects.values_list('restaurant_id', 'food_id'):
+                        unavailable[restaurant_id].add(food_id)
+                self._unavailable = {key: frozenset(value) for key, value in unavailable.items()}
+                self._version = version
+                self._expires = time.monotonic()+getattr(settings, 'AVAILABILITY_INDEX_TTL', 5)
+            return self._unavailable
+
+    def unavailable_foods(self, restaurant_id):
+        return self._current().get(restaurant_id, frozenset())
+
+    def available_foods(self, restaurant_id, food_ids):
+        return set(food_ids) - self.unavailable_foods(restaurant_id)
+
+    def is_available(self, restaurant_id, food_id):
+        return food_id not in self.unavailable_foods(restaurant_id)
+
+    def clear(self):
+        with self._lock:
+            self._version = None
+            self._expires = 0
+            self._unavailable = {}
+
+
+availability_index = AvailabilityIndex()
@@ -0,0 +1,100 @@
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from rest_framework import status
+from rest_framework.response import Response
+
+from .routers import use_primary
+
+VERSION_KEY = 'menu:version'
+
+
+def menu_cache():
+    return caches['menu']
+
+
+def menu_version():
+    # Seeded from the clock so an evicted version never repeats an old one.
+    return menu_cache().get_or_set(VERSION_KEY, time.time_ns, None)
+
+
+def bump_menu_version():
+    # Old entries are never deleted, they just stop being addressed and age out.
+    try:
+        menu_cache().incr(VERSION_KEY)
+    except ValueError:
+        menu_cache().set(VERSION_KEY, time.time_ns(), None)
+
+
+def body_params(request):
+    data = request.data.dict() if hasattr(request.data, 'dict') else request.data
+    return data if isinstance(data, dict) else {}
+
+
+def request_params(request):
+    # Query string first; a GET body is still read for older clients.
+    params = dict(body_params(request))
+    params.update(request.query_params.dict())
+    return params
+
+
+def menu_lookup(request, name):
+    # Returns the key and ETag of this menu response, and the response itself
+    # (200 or 304) when the current version already has it.
+    params = json.dumps(request_params(request), sort_keys=True, default=str)
+    key = f'menu:{menu_version()}:{name}:{hashlib.md5(params.encode()).hexdigest()}'
+    etag = '"'+hashlib.md5(key.encode()).hexdigest()+'"'
+    data = menu_cache().get(key)
+    if data is None:
+        return key, etag, None
+    if request.headers.get('If-None-Match') == etag:
+        return key, etag, Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+    return key, etag, Response(data, status=status.HTTP_200_OK, headers={'ETag': etag})
+
+
+def menu_store(key, etag, response):
+    if response.status_code != status.HTTP_200_OK:
+        return response
+    menu_cache().set(key, response.data)
+    return Response(response.data, status=status.HTTP_200_OK, headers={'ETag': etag})
+
+
+def cached_menu_response(request, name, build):
+    key, etag, response = menu_lookup(request, name)
+    if response is None:
+        # Cached under the current version, so never built from a lagging replica.
+        with use_primary():
+            response = menu_store(key, etag, build())
+    return response
+
+
+async def acached_menu_response(request, name, build):
+    key, etag, response = menu_lookup(request, name)
+    if response is None:
+        with use_primary():
+            response = menu_store(key, etag, await build())
+    return response
+
+
+class HTTPCacheMixin:
+    # Lets HTTP caches and the reverse proxy keep successful GET list
+    # responses for cache_max_age seconds, keyed on the URL. A request that
+    # sends its filters in the body cannot be keyed that way, so it is
+    # marked no-store.
+    cache_max_age = None
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if request.method not in ('GET', 'HEAD') or response.status_code not in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            return response
+        if body_params(request):
+            patch_cache_control(response, no_store=True)
+        else:
+            max_age = self.cache_max_age if self.cache_max_age is not None else getattr(settings, 'API_CACHE_MAX_AGE', 60)
+            patch_cache_control(response, public=True, max_age=max_age)
+        patch_vary_headers(response, ['Accept', 'Authorization', 'Cookie'])
+        return response
@@ -0,0 +1,134 @@
+import asyncio
+import itertools
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from .renderers import FastJSONRenderer
+
+# Table and order events, pushed to /api/events subscribers instead of
+# being polled. Channels are 'restaurant:<id>' (table claim/release and
+# order events of that restaurant) and 'order:<id>'.
+
+
+class Subscription:
+    # Events for one stream, handed to its event loop from whichever thread
+    # published them. A consumer that falls QUEUE_SIZE events behind gets a
+    # single 'resync' event instead and should reload its snapshot.
+    QUEUE_SIZE = 1000
+
+    def __init__(self, broker, channels):
+        self.broker = broker
+        self.channels = channels
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(self.QUEUE_SIZE)
+
+    def deliver(self, message):
+        try:
+            self.loop.call_soon_threadsafe(self._put, message)
+        except RuntimeError:
+            # The loop has closed; the stream's close() just has not run yet.
+            pass
+
+    def _put(self, message):
+        if self.queue.full():
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            message = {'id': message['id'], 'event': 'resync', 'data': {}}
+        self.queue.put_nowait(message)
+
+    async def get(self, timeout=None):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class LocalBroker:
+    # In-process pub/sub: events reach the streams served by this process
+    # only. A broker for several processes or hosts subclasses this and
+    # overrides publish() to send the message to the shared bus (Redis,
+    # Postgres NOTIFY, ...), calling dispatch() for every message it
+    # receives from there.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = defaultdict(set)
+        self._ids = itertools.count(1)
+
+    def subscribe(self, channels):
+        subscription = Subscription(self, channels)
+        with self._lock:
+            for channel in channels:
+                self._subscriptions[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscriptions[channel].discard(subscription)
+                if not self._subscriptions[channel]:
+                    del self._subscriptions[channel]
+
+    def publish(self, channels, event, data):
+        self.dispatch(channels, {'id': next(self._ids), 'event': event, 'data': data})
+
+    def dispatch(self, channels, message):
+        with self._lock:
+            subscriptions = set().union(*[self._subscriptions.get(channel, ()) for channel in channels])
+        for subscription in subscriptions:
+            subscription.deliver(message)
+
+
+_broker = None
+
+
+def get_event_broker():
+    global _broker
+    if _broker is None:
+        path = getattr(settings, 'EVENT_BROKER', None)
+        _broker = import_string(path)() if path else LocalBroker()
+    return _broker
+
+
+def channels_for(restaurant_id=None, order_id=None):
+    channels = []
+    if restaurant_id:
+        channels.append(f'restaurant:{restaurant_id}')
+    if order_id:
+        channels.append(f'order:{order_id}')
+    return channels
+
+
+def publish(event, data, restaurant_id=None, order_id=None):
+    # Sent once the surrounding transaction commits, so a stream never shows
+    # a claim or an order line that was rolled back.
+    channels = channels_for(restaurant_id, order_id)
+    if channels:
+        transaction.on_commit(lambda: get_event_broker().publish(channels, event, data))
+
+
+def format_event(message):
+    data = FastJSONRenderer().render(message['data']).decode()
+    return f'id: {message["id"]}\nevent: {message["event"]}\ndata: {data}\n\n'
+
+
+async def stream(subscription, snapshot):
+    # The snapshot is read after subscribing, so no event is missed between
+    # the two; a client may see an event already reflected in the snapshot.
+    heartbeat = getattr(settings, 'EVENT_HEARTBEAT_SECONDS', 15)
+    try:
+        yield format_event({'id': 0, 'event': 'snapshot', 'data': snapshot})
+        while True:
+            try:
+                message = await subscription.get(heartbeat)
+            except asyncio.TimeoutError:
+                # Keeps proxies from closing an idle stream.
+                yield ': keep-alive\n\n'
+                continue
+            yield format_event(message)
+    finally:
+        subscription.close()
@@ -0,0 +1,116 @@
+from .cache import request_params
+from .search import get_search_backend
+
+
+class FilterError(Exception):
+
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+
+
+def boolean(value):
+    if isinstance(value, bool):
+        return value
+    if str(value).lower() in ('true', '1'):
+        return True
+    if str(value).lower() in ('false', '0'):
+        return False
+    raise ValueError(value)
+
+
+def search(kind):
+    return lambda queryset, value: get_search_backend().filter(queryset, kind, value)
+
+
+class Filter:
+    # parse turns the raw query/body value into its type (ValueError or
+    # TypeError become a 400 with message); lookup is a field lookup or a
+    # callable(queryset, value), or None for values the view uses itself.
+
+    def __init__(self, parse, message=None, lookup=None, default=None):
+        self.parse = parse
+        self.message = message
+        self.lookup = lookup
+        self.default = default
+
+
+class FilterSet:
+    # Typed filters of one list endpoint, read from the query string (and
+    # from a JSON body for older clients) and validated once.
+    filters = {}
+
+    def __init__(self, **values):
+        for name, spec in self.filters.items():
+            setattr(self, name, values.get(name, spec.default))
+
+    @classmethod
+    def from_request(cls, request):
+        params = request_params(request)
+        values = {}
+        for name, spec in cls.filters.items():
+            value = params.get(name)
+            if value is None or value == '':
+                continue
+            try:
+                values[name] = spec.parse(value)
+            except (TypeError, ValueError):
+                raise FilterError(spec.message or f'{name} is invalid.')
+        return cls(**values)
+
+    def apply(self, queryset):
+        for name, spec in self.filters.items():
+            value = getattr(self, name)
+            if value is None or spec.lookup is None:
+                continue
+            if callable(spec.lookup):
+                queryset = spec.lookup(queryset, value)
+            else:
+                queryset = queryset.filter(**{spec.lookup: value})
+        return queryset
+
+
+class RestaurantFilters(FilterSet):
+    filters = {
+        'name': Filter(str, lookup='name__icontains'),
+        'location': Filter(str, lookup='location__icontains'),
+    }
+
+
+class TableFilters(FilterSet):
+    filters = {
+        'available': Filter(boolean, 'available must be true or false.', lookup='available', default=True),
+        'max_no': Filter(int, 'max_no must be int.', lookup='max_no__gte'),
+        'restaurant_id': Filter(int, 'restaurant id must be int.', lookup='restaurant_id'),
+        'location': Filter(str, lookup='restaurant__location__icontains'),
+    }
+
+
+class TypeFilters(FilterSet):
+    filters = {
+        'search': Filter(str, lookup=search('type')),
+    }
+
+
+class FoodFilters(FilterSet):
+    filters = {
+        'name': Filter(str, lookup=search('food')),
+        'price_gte': Filter(float, 'price must be float', lookup='price__gte'),
+        'price_lte': Filter(float, 'price must be float', lookup='price__lte'),
+        'point_gte': Filter(float, 'point must be float', lookup='ave_point__gte'),
+        'point_lte': Filter(float, 'point must be float', lookup='ave_point__lte'),
+        'type_id': Filter(int, 'type id must be int', lookup='type_id'),
+        # Only marks each food as available there or not.
+        'restaurant_id': Filter(int, 'restaurant id must be int'),
+    }
+
+
+class CommentFilters(FilterSet):
+    filters = {
+        'food_name': Filter(str, lookup=lambda queryset, value: queryset.filter(food_id__in=get_search_backend().match_ids('food', value))),
+        'search': Filter(str, lookup=search('comment')),
+        'give_point_gte': Filter(float, 'give_point must be float', lookup='give_point__gte'),
+        'give_point_lte': Filter(float, 'give_point must be float', lookup='give_point__lte'),
+        'restaurant_id': Filter(int, 'Restaurant_id must be int.', lookup='restaurant_id'),
+        'user_id': Filter(int, 'User_id must be int.', lookup='user_id'),
+    }
@@ -0,0 +1,153 @@
+import os
+import random
+import tempfile
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+from rest_framework.test import APIClient
+
+from api_endpoint.models import *
+from api_endpoint.orders import complete_order, order_queryset
+from api_endpoint.profiling import QueryRecorder
+from api_endpoint.synthetic import SCALES, generate
+from api_endpoint.tasks import run_pending
+
+SCENARIOS = ['booking', 'items', 'menu', 'reviews']
+
+
+class Command(BaseCommand):
+    help = 'Run the ordering hot-path scenarios against a throwaway test database and report req/s, p50/p99 and query counts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=SCALES, default='small')
+        parser.add_argument('--scenario', choices=SCENARIOS, action='append', help='Repeatable; default runs all.')
+        parser.add_argument('--requests', type=int, default=500, help='Requests per scenario.')
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        # A file-backed test database so worker threads share one SQLite database.
+        directory = tempfile.mkdtemp()
+        settings.DATABASES['default'].setdefault('TEST', {})['NAME'] = os.path.join(directory, 'benchmark.sqlite3')
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False, aliases={'default'})
+        try:
+            start = time.perf_counter()
+            data = generate(**SCALES[options['scale']], seed=options['seed'])
+            self.stdout.write(f'generated {options["scale"]} data set in {time.perf_counter()-start:.1f}s')
+            self.stdout.write(f'{"scenario":10} {"requests":>8} {"req/s":>8} {"p50 ms":>8} {"p99 ms":>8} {"queries":>8}  status')
+            for scenario in options['scenario'] or SCENARIOS:
+                self.run_scenario(scenario, data, options)
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+    def check_bookings(self):
+        # A 404 is only right when the restaurant really was full, and a
+        # completed order must have given its table back.
+        held = Order.objects.filter(complete=False).values('table_id')
+        leaked = Table.objects.filter(available=False).exclude(id__in=held).count()
+        if self.turned_away or leaked:
+            raise CommandError(f'{len(self.turned_away)} parties were turned away from a free table; {leaked} tables of completed orders were never released.')
+
+    def run_scenario(self, scenario, data, options):
+        self.turned_away = []
+        rng = random.Random(options['seed'])
+        users = list(User.objects.filter(id__in=data['user_ids'][:options['concurrency']]))
+        per_worker = options['requests']//options['concurrency']
+        results = []
+        lock = threading.Lock()
+
+        def worker(user, seed):
+            client = APIClient()
+            client.force_authenticate(user)
+            worker_rng = random.Random(seed)
+            step = getattr(self, scenario)
+            state = {}
+            local = []
+            try:
+                for _ in range(per_worker):
+                    recorder = QueryRecorder()
+                    start = time.perf_counter()
+                    with ExitStack() as stack:
+                        for db in connections.all():
+                            stack.enter_context(db.execute_wrapper(recorder))
+                        response = step(client, user, worker_rng, data, state)
+                    local.append((time.perf_counter()-start, recorder.count, response.status_code))
+            finally:
+                connection.close()
+            with lock:
+                results.extend(local)
+
+        threads = [threading.Thread(target=worker, args=(user, rng.random())) for user in users]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter()-start
+        self.report(scenario, results, elapsed)
+        # What the requests queued (e.g. rating updates), timed on its own.
+        start = time.perf_counter()
+        tasks = run_pending()
+        if tasks:
+            self.stdout.write(f'{"":10} {tasks:8} background tasks in {time.perf_counter()-start:.1f}s')
+        if scenario == 'booking':
+            self.check_bookings()
+
+    def report(self, scenario, results, elapsed):
+        if not results:
+            self.stdout.write(f'{scenario:10} no requests')
+            return
+        latencies = sorted(latency for latency, _, _ in results)
+        statuses = {}
+        for _, _, code in results:
+            statuses[code] = statuses.get(code, 0)+1
+        p50 = latencies[len(latencies)//2]*1000
+        p99 = latencies[min(len(latencies)-1, int(len(latencies)*0.99))]*1000
+        queries = sum(count for _, count, _ in results)/len(results)
+        self.stdout.write(
+            f'{scenario:10} {len(results):8} {len(results)/elapsed:8.1f} {p50:8.1f} {p99:8.1f} {queries:8.1f}  '
+            + ' '.join(f'{code}:{n}' for code, n in sorted(statuses.items()))
+        )
+
+    # Dinner rush: diners ask for the best free table; every few bookings a
+    # finished order is completed so tables keep turning over. Completion
+    # releases the table in a background task, run here before booking on.
+    def booking(self, client, user, rng, data, state):
+        orders = state.setdefault('orders', [])
+        if len(orders) > 3:
+            complete_order(order_queryset().get(id=orders.pop(0)))
+            run_pending()
+        restaurant_id, no_of_people = rng.choice(data['restaurant_ids']), rng.randint(1, 6)
+        response = client.post('/api/table/allocate', {'restaurant_id': restaurant_id, 'no_of_people': no_of_people})
+        if response.status_code == 201:
+            orders.append(response.data['order']['id'])
+        elif Table.objects.filter(restaurant_id=restaurant_id, available=True, max_no__gte=no_of_people).exists():
+            self.turned_away.append((restaurant_id, no_of_people))
+        return response
+
+    def items(self, client, user, rng, data, state):
+        if 'order' not in state:
+            table = Table.objects.filter(restaurant_id=rng.choice(data['restaurant_ids'])).first()
+            state['order'] = Order.objects.create(user=user, table=table).id
+        return client.post('/api/order-food', {'order_id': state['order'], 'food_id': rng.choice(data['food_ids']), 'number': rng.randint(1, 3)})
+
+    def menu(self, client, user, rng, data, state):
+        if rng.random() < 0.2:
+            return client.get('/api/type')
+        return client.get('/api/food', {'page_size': 50})
+
+    def reviews(self, client, user, rng, data, state):
+        return client.post('/api/comment', {
+            'food_id': rng.choice(data['food_ids']),
+            'restaurant_id': rng.choice(data['restaurant_ids']),
+            'give_point': rng.randint(1, 5),
+            'comment': rng.choice(['great', 'too salty', '好味', 'slow service']),
+        })
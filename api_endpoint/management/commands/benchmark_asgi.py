@@ -0,0 +1,108 @@
+import asyncio
+import io
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.util import setup_testing_defaults
+
+from django.contrib.auth.models import User
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+from rest_framework.authtoken.models import Token
+
+PATHS = ['restaurant', 'table', 'type', 'food', 'comment']
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare concurrent-request throughput of the read endpoints: sync views under WSGI (one thread per '
+        'connection), the same views under ASGI, and their /api/async/ variants under ASGI. Requests are fed '
+        'to the handlers in-process against the configured database, so seed it first.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', action='append', dest='paths', help='Endpoint under /api/, e.g. "food?price_gte=20". Repeatable.')
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--token', help='Token to send; defaults to one for a "benchmark" user.')
+
+    def handle(self, *args, **options):
+        token = options['token'] or Token.objects.get_or_create(user=User.objects.get_or_create(username='benchmark')[0])[0].key
+        self.headers = {'Authorization': f'Token {token}'}
+        self.requests, self.concurrency = options['requests'], options['concurrency']
+        wsgi, asgi = get_wsgi_application(), get_asgi_application()
+
+        self.stdout.write(f'{self.requests} requests, {self.concurrency} concurrent')
+        self.stdout.write(f'{"endpoint":24} {"server":5} {"view":5} {"req/s":>8} {"p50 ms":>8} {"p99 ms":>8}  status')
+        for path in options['paths'] or PATHS:
+            for server, view, prefix in [('wsgi', 'sync', '/api/'), ('asgi', 'sync', '/api/'), ('asgi', 'async', '/api/async/')]:
+                run = self.run_wsgi if server == 'wsgi' else self.run_asgi
+                elapsed, latencies, statuses = run(wsgi if server == 'wsgi' else asgi, prefix+path)
+                latencies.sort()
+                self.stdout.write(
+                    f'{path:24} {server:5} {view:5} {self.requests/elapsed:8.0f} {latencies[len(latencies)//2]*1000:8.1f} '
+                    f'{latencies[int(len(latencies)*0.99)]*1000:8.1f}  {dict(statuses)}'
+                )
+
+    def run_wsgi(self, application, url):
+        path, _, query = url.partition('?')
+
+        def call(_):
+            environ = {'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query, 'HTTP_HOST': 'localhost', 'wsgi.input': io.BytesIO()}
+            environ.update({'HTTP_'+name.upper(): value for name, value in self.headers.items()})
+            setup_testing_defaults(environ)
+            status = []
+            start = time.perf_counter()
+            b''.join(application(environ, lambda line, headers, exc_info=None: status.append(int(line[:3]))))
+            return time.perf_counter()-start, status[0]
+
+        def close(_):
+            connections.close_all()
+
+        with ThreadPoolExecutor(self.concurrency) as pool:
+            start = time.perf_counter()
+            results = list(pool.map(call, range(self.requests)))
+            elapsed = time.perf_counter()-start
+            list(pool.map(close, range(self.concurrency)))
+        return elapsed, [latency for latency, _ in results], Counter(status for _, status in results)
+
+    def run_asgi(self, application, url):
+        path, _, query = url.partition('?')
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+            'path': path, 'raw_path': path.encode(), 'query_string': query.encode(), 'root_path': '',
+            'headers': [(b'host', b'localhost')]+[(name.lower().encode(), value.encode()) for name, value in self.headers.items()],
+            'client': ('127.0.0.1', 0), 'server': ('localhost', 80),
+        }
+
+        async def call(slots):
+            async with slots:
+                messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+                disconnected = asyncio.Event()
+                status = []
+
+                async def receive():
+                    if messages:
+                        return messages.pop()
+                    # The client stays connected until the response is sent.
+                    await disconnected.wait()
+                    return {'type': 'http.disconnect'}
+
+                async def send(message):
+                    if message['type'] == 'http.response.start':
+                        status.append(message['status'])
+
+                start = time.perf_counter()
+                await application(dict(scope), receive, send)
+                return time.perf_counter()-start, status[0]
+
+        async def main():
+            slots = asyncio.Semaphore(self.concurrency)
+            start = time.perf_counter()
+            results = await asyncio.gather(*[call(slots) for _ in range(self.requests)])
+            return time.perf_counter()-start, results
+
+        elapsed, results = asyncio.run(main())
+        return elapsed, [latency for latency, _ in results], Counter(status for _, status in results)
@@ -0,0 +1,56 @@
+import io
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from api_endpoint import renderers
+from api_endpoint.models import *
+from api_endpoint.renderers import FastJSONParser, FastJSONRenderer
+from api_endpoint.serializers import TypeSerializer, comment_rows, food_rows
+from api_endpoint.synthetic import generate
+
+
+class Command(BaseCommand):
+    help = 'Compare JSONRenderer/JSONParser against the orjson-backed pair on large menu and comment payloads (rolled back afterwards).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if renderers.orjson is None:
+            self.stderr.write('orjson is not installed; FastJSONRenderer falls back to the stdlib path.')
+        rows = options['rows']
+        with transaction.atomic():
+            generate(restaurants=1, tables=1, types=20, foods=rows, users=100, orders=0, comments=rows, seed=options['seed'], search_index=False)
+            payloads = [
+                ('food', {'food': food_rows.to_representation(food_rows.values(Food.objects.order_by('id')[:rows]))}),
+                ('menu', TypeSerializer(TypeSerializer.setup_eager_loading(Type.objects.all()), many=True).data),
+                ('comment', {'comment': comment_rows.to_representation(comment_rows.values(Comment.objects.order_by('-created_at', '-id')[:rows]))}),
+            ]
+            transaction.set_rollback(True)
+
+        self.stdout.write(f'{"payload":8} {"bytes":>10} {"render ms":>10} {"fast ms":>8} {"parse ms":>9} {"fast ms":>8}')
+        for name, data in payloads:
+            body = JSONRenderer().render(data)
+            render = self.time(options['repeat'], lambda: JSONRenderer().render(data))
+            fast_render = self.time(options['repeat'], lambda: FastJSONRenderer().render(data))
+            parse = self.time(options['repeat'], lambda: JSONParser().parse(io.BytesIO(body)))
+            fast_parse = self.time(options['repeat'], lambda: FastJSONParser().parse(io.BytesIO(body)))
+            self.stdout.write(
+                f'{name:8} {len(body):10} {render*1000:10.1f} {fast_render*1000:8.1f} {parse*1000:9.1f} {fast_parse*1000:8.1f}'
+                f'  render {render/fast_render:.1f}x, parse {parse/fast_parse:.1f}x'
+            )
+
+    def time(self, repeat, run):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            elapsed = time.perf_counter()-start
+            best = elapsed if best is None else min(best, elapsed)
+        return best
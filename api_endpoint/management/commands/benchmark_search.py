@@ -0,0 +1,79 @@
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from api_endpoint.models import *
+from api_endpoint.search import SQLiteFTSBackend
+
+WORDS = ['beef', 'pork', 'chicken', 'shrimp', 'noodle', 'rice', 'soup', 'fried', 'steamed', 'roast', 'curry', 'tofu']
+CJK = ['牛肉', '豬肉', '雞', '蝦', '麵', '飯', '湯', '炒', '蒸', '燒', '咖喱', '豆腐']
+QUERIES = ['beef', 'noodle soup', '牛肉', '蝦餃', 'roast pork']
+
+
+class Command(BaseCommand):
+    help = 'Compare the FTS5 search index against icontains scans on synthetic data (rolled back afterwards).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--foods', type=int, default=100000)
+        parser.add_argument('--comments', type=int, default=1000000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with transaction.atomic():
+            self.generate(rng, options['foods'], options['comments'])
+            backend = SQLiteFTSBackend()
+            for kind in ['food', 'comment']:
+                start = time.perf_counter()
+                backend.rebuild(kind)
+                self.stdout.write(f'indexed {kind} in {time.perf_counter()-start:.1f}s')
+            for query in QUERIES:
+                scan = self.time(options['repeat'], lambda: list(Food.objects.filter(
+                    Q(chinese_name__icontains=query)|Q(english_name__icontains=query)).values_list('id', flat=True)))
+                fts = self.time(options['repeat'], lambda: list(backend.filter(Food.objects.all(), 'food', query).values_list('id', flat=True)))
+                self.stdout.write(f'food    {query!r:16} icontains {scan*1000:8.1f}ms  fts {fts*1000:8.1f}ms')
+                scan = self.time(options['repeat'], lambda: Comment.objects.filter(comment__icontains=query).count())
+                fts = self.time(options['repeat'], lambda: backend.filter(Comment.objects.all(), 'comment', query).count())
+                self.stdout.write(f'comment {query!r:16} icontains {scan*1000:8.1f}ms  fts {fts*1000:8.1f}ms')
+            transaction.set_rollback(True)
+
+    def time(self, repeat, run):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            elapsed = time.perf_counter()-start
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    def name(self, rng):
+        i = rng.randrange(len(WORDS))
+        j = rng.randrange(len(WORDS))
+        return CJK[i]+CJK[j], f'{WORDS[i]} {WORDS[j]} {rng.randrange(1000)}'
+
+    def generate(self, rng, no_of_foods, no_of_comments):
+        user = User.objects.create_user(username=f'benchmark-{rng.random()}')
+        restaurant = Restaurant.objects.create(name='Benchmark', location='Benchmark')
+        food_type = Type.objects.create(chinese_name='測試', english_name='Benchmark')
+        foods = []
+        for _ in range(no_of_foods):
+            chinese_name, english_name = self.name(rng)
+            foods.append(Food(chinese_name=chinese_name, english_name=english_name, price=rng.randrange(10, 300), type=food_type))
+        foods = Food.objects.bulk_create(foods, batch_size=5000)
+        food_ids = [food.id for food in foods]
+        for start in range(0, no_of_comments, 10000):
+            Comment.objects.bulk_create([
+                Comment(
+                    user=user,
+                    restaurant=restaurant,
+                    food_id=rng.choice(food_ids),
+                    comment=' '.join(rng.choice(WORDS+CJK) for _ in range(8)),
+                    give_point=rng.randrange(0, 6),
+                )
+                for _ in range(min(10000, no_of_comments-start))
+            ])
@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from api_endpoint.models import *
+from api_endpoint.serializers import comment_rows, food_rows
+from api_endpoint.synthetic import generate
+
+
+class Command(BaseCommand):
+    help = 'Compare ModelSerializer against the values() read path on large list responses (rolled back afterwards).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        renderer = JSONRenderer()
+        with transaction.atomic():
+            generate(restaurants=1, tables=1, types=10, foods=rows, users=100, orders=0, comments=rows, seed=options['seed'], search_index=False)
+            self.stdout.write(f'{"list":8} {"path":10} {"fetch ms":>9} {"serialize ms":>13} {"render ms":>10} {"total ms":>9}')
+            for name, values_serializer, queryset in [
+                ('food', food_rows, Food.objects.select_related('type').order_by('id')[:rows]),
+                ('comment', comment_rows, Comment.objects.select_related('food').order_by('-created_at', '-id')[:rows]),
+            ]:
+                model = self.time(options['repeat'], lambda: list(queryset.all()), lambda page: values_serializer.serializer_class(page, many=True).data, renderer.render)
+                values = self.time(options['repeat'], lambda: list(values_serializer.values(queryset.all())), values_serializer.to_representation, renderer.render)
+                self.report(name, 'serializer', model)
+                self.report(name, 'values', values)
+                self.stdout.write(f'{name:8} speedup {sum(model)/sum(values):.1f}x overall, {model[1]/values[1]:.1f}x serializing')
+            transaction.set_rollback(True)
+
+    def time(self, repeat, fetch, serialize, render):
+        # Best of each phase: fetch rows, serialize them, render JSON.
+        best = None
+        for _ in range(repeat):
+            timings = []
+            start = time.perf_counter()
+            page = fetch()
+            timings.append(time.perf_counter()-start)
+            start = time.perf_counter()
+            data = serialize(page)
+            timings.append(time.perf_counter()-start)
+            start = time.perf_counter()
+            render(data)
+            timings.append(time.perf_counter()-start)
+            best = timings if best is None else [min(a, b) for a, b in zip(best, timings)]
+        return best
+
+    def report(self, name, path, timings):
+        fetch, serialize, render = (t*1000 for t in timings)
+        self.stdout.write(f'{name:8} {path:10} {fetch:9.1f} {serialize:13.1f} {render:10.1f} {fetch+serialize+render:9.1f}')
@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api_endpoint.menus import menu_snapshot
+from api_endpoint.models import *
+
+
+class Command(BaseCommand):
+    help = 'Bring every restaurant menu snapshot up to date (or build it), e.g. after a deploy or a bulk load.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--restaurant', type=int, action='append', dest='restaurants', help='Only this restaurant id. Repeatable.')
+
+    def handle(self, *args, **options):
+        restaurant_ids = options['restaurants'] or list(Restaurant.objects.order_by('id').values_list('id', flat=True))
+        start = time.perf_counter()
+        built = sum(menu_snapshot(restaurant_id) is not None for restaurant_id in restaurant_ids)
+        self.stdout.write(self.style.SUCCESS(f'{built} menu snapshots up to date in {time.perf_counter()-start:.1f}s.'))
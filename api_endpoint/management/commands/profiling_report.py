@@ -0,0 +1,36 @@
+import glob
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api_endpoint.profiling import merge, report
+
+
+class Command(BaseCommand):
+    help = 'Print per-route profiling aggregates merged from every process snapshot in PROFILING_DIR.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--json', action='store_true', help='Dump the full report as JSON.')
+        parser.add_argument('--reset', action='store_true', help='Delete the snapshots after printing.')
+
+    def handle(self, *args, **options):
+        paths = glob.glob(os.path.join(settings.PROFILING_DIR, 'profile-*.json'))
+        snapshots = []
+        for path in paths:
+            with open(path) as f:
+                snapshots.append(json.load(f))
+        rows = report(merge(snapshots))
+        if options['json']:
+            self.stdout.write(json.dumps(rows, indent=2, ensure_ascii=False))
+        else:
+            self.stdout.write(f'{"route":40} {"count":>7} {"mean":>8} {"p50":>6} {"p99":>6} {"sql":>6} {"sql ms":>7} {"serial":>7} {"render":>7} {"n+1":>5}')
+            for row in sorted(rows, key=lambda row: -row['count']*row['mean_ms']):
+                self.stdout.write(
+                    f'{row["route"][:40]:40} {row["count"]:7} {row["mean_ms"]:8} {row["p50_ms"]:6} {row["p99_ms"]:6} '
+                    f'{row["mean_sql_count"]:6} {row["mean_sql_ms"]:7} {row["mean_serialize_ms"]:7} {row["mean_render_ms"]:7} {row["n_plus_one"]:5}'
+                )
+        if options['reset']:
+            for path in paths:
+                os.remove(path)
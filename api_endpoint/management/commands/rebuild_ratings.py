@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api_endpoint.ratings import rebuild_ratings
+
+
+class Command(BaseCommand):
+    help = 'Recompute Food.point_sum, no_of_comment and ave_point from all comments.'
+
+    def handle(self, *args, **options):
+        count = rebuild_ratings()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt ratings for {count} foods.'))
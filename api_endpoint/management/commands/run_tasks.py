@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api_endpoint.models import *
+from api_endpoint.tasks import purge_tasks, retry_failed, run_pending, task_pool
+
+
+class Command(BaseCommand):
+    help = (
+        'Run background tasks (ratings, order completion) outside the web processes, e.g. with '
+        'DJANGO_TASK_WORKERS=0. Several of these may run at once; each task is claimed by one worker.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Worker threads.')
+        parser.add_argument('--once', action='store_true', help='Run the tasks that are due now and exit.')
+        parser.add_argument('--retry-failed', action='store_true', help='Queue failed tasks again first, with fresh attempts.')
+        parser.add_argument('--purge', action='store_true', help='Delete done tasks older than TASK_RETENTION and exit.')
+
+    def handle(self, *args, **options):
+        if options['purge']:
+            self.stdout.write(self.style.SUCCESS(f'{purge_tasks()} done tasks deleted.'))
+            return
+        if options['retry_failed']:
+            self.stdout.write(f'{retry_failed()} failed tasks queued again.')
+        if options['once']:
+            start = time.perf_counter()
+            count = run_pending()
+            failed = Task.objects.filter(status=Task.FAILED).count()
+            self.stdout.write(self.style.SUCCESS(f'{count} tasks run in {time.perf_counter()-start:.1f}s, {failed} failed in total.'))
+            return
+        threads = task_pool.start(options['workers'])
+        self.stdout.write(f'{len(threads)} task workers running; Ctrl-C stops them (a running task is retried later).')
+        try:
+            for thread in threads:
+                thread.join()
+        except KeyboardInterrupt:
+            pass
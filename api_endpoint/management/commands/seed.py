@@ -0,0 +1,81 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api_endpoint.synthetic import POINTS, SCALES, TABLE_SIZES, generate
+
+COUNTS = ['restaurants', 'tables', 'types', 'foods', 'users', 'orders', 'comments']
+
+
+def weights(value):
+    # "2:3,4:4,6:1" -> {2: 3, 4: 4, 6: 1}
+    try:
+        pairs = [item.split(':') for item in value.split(',')]
+        return {int(key): float(weight) for key, weight in pairs}
+    except ValueError:
+        raise CommandError(f'Expected value:weight pairs, got {value!r}.')
+
+
+def int_range(value):
+    try:
+        low, high = (int(part) for part in value.split('-'))
+    except ValueError:
+        raise CommandError(f'Expected a range like 1-6, got {value!r}.')
+    if not 0 < low <= high:
+        raise CommandError(f'Expected a range like 1-6, got {value!r}.')
+    return low, high
+
+
+class Command(BaseCommand):
+    help = 'Bulk-load deterministic synthetic restaurants, tables, menus, users, orders and comments.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=SCALES, default='small', help='Preset row counts; the options below override them.')
+        parser.add_argument('--restaurants', type=int)
+        parser.add_argument('--tables', type=int, help='Tables per restaurant.')
+        parser.add_argument('--types', type=int)
+        parser.add_argument('--foods', type=int)
+        parser.add_argument('--users', type=int)
+        parser.add_argument('--orders', type=int)
+        parser.add_argument('--comments', type=int)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=20000)
+        parser.add_argument('--table-sizes', default=','.join(f'{k}:{v}' for k, v in TABLE_SIZES.items()), help='Seat count weights, e.g. 2:3,4:4,6:1.')
+        parser.add_argument('--point-weights', default=','.join(f'{k}:{v}' for k, v in POINTS.items()), help='Comment score weights, e.g. 1:1,5:2.')
+        parser.add_argument('--lines-per-order', default='1-6')
+        parser.add_argument('--unavailable-rate', type=float, default=0.02, help='Share of foods unavailable per restaurant.')
+        parser.add_argument('--food-skew', type=float, default=1.0, help='Zipf exponent of food popularity; 0 is uniform.')
+        parser.add_argument('--days', type=int, default=365, help='Spread created_at over this many days.')
+        parser.add_argument('--no-search-index', action='store_true')
+
+    def handle(self, *args, **options):
+        counts = dict(SCALES[options['scale']])
+        for name in COUNTS:
+            if options[name] is not None:
+                counts[name] = options[name]
+        if counts['restaurants'] < 1 or counts['tables'] < 1 or counts['types'] < 1 or counts['foods'] < 1 or counts['users'] < 1:
+            raise CommandError('restaurants, tables, types, foods and users must be at least 1.')
+
+        rows = {}
+        start = time.perf_counter()
+
+        def progress(model, count):
+            rows[model.__name__] = count
+            self.stdout.write(f'{model.__name__:12} {count:10} rows  {time.perf_counter()-start:7.1f}s')
+
+        generate(
+            **counts,
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            unavailable=options['unavailable_rate'],
+            table_sizes=weights(options['table_sizes']),
+            points=weights(options['point_weights']),
+            lines_per_order=int_range(options['lines_per_order']),
+            food_skew=options['food_skew'],
+            days=options['days'],
+            search_index=not options['no_search_index'],
+            progress=progress,
+        )
+        elapsed = time.perf_counter()-start
+        total = sum(rows.values())
+        self.stdout.write(self.style.SUCCESS(f'Seeded {total} rows in {elapsed:.1f}s ({total/elapsed:,.0f} rows/s).'))
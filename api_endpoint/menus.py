@@ -0,0 +1,94 @@
+from bisect import insort
+from datetime import timedelta
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import *
+from .serializers import menu_food_rows, menu_type_rows
+
+
+def record_change(food_ids=(), type_ids=(), restaurant_id=None):
+    # Queues the foods/types for every existing snapshot (or the one of
+    # restaurant_id); a restaurant without a snapshot is built in full on
+    # its first read anyway.
+    snapshots = MenuSnapshot.objects.values_list('restaurant_id', flat=True)
+    if restaurant_id is not None:
+        snapshots = snapshots.filter(restaurant_id=restaurant_id)
+    snapshot_ids = list(snapshots)
+    MenuChange.objects.bulk_create(
+        [MenuChange(snapshot_id=snapshot_id, food_id=food_id) for snapshot_id in snapshot_ids for food_id in food_ids]
+        + [MenuChange(snapshot_id=snapshot_id, type_id=type_id) for snapshot_id in snapshot_ids for type_id in type_ids]
+    )
+
+
+def food_entries(queryset, unavailable):
+    foods = menu_food_rows.to_representation(menu_food_rows.values(queryset))
+    for food in foods:
+        food['available'] = food['id'] not in unavailable
+    return foods
+
+
+def build_menu(restaurant_id):
+    groups = {row['id']: {**row, 'foods': []} for row in menu_type_rows.to_representation(menu_type_rows.values(Type.objects.order_by('id')))}
+    unavailable = set(Unavailable.objects.filter(restaurant_id=restaurant_id).values_list('food_id', flat=True))
+    for food in food_entries(Food.objects.order_by('id'), unavailable):
+        groups[food['type']]['foods'].append(food)
+    return {'restaurant_id': restaurant_id, 'types': list(groups.values())}
+
+
+def patch_menu(data, restaurant_id, food_ids, type_ids):
+    # Re-reads only the changed foods and types; the result equals build_menu().
+    groups = {group['id']: group for group in data['types']}
+    foods = []
+    if food_ids:
+        unavailable = set(Unavailable.objects.filter(restaurant_id=restaurant_id, food_id__in=food_ids).values_list('food_id', flat=True))
+        foods = food_entries(Food.objects.filter(id__in=food_ids), unavailable)
+    type_ids = set(type_ids) | {food['type'] for food in foods if food['type'] not in groups}
+    if type_ids:
+        rows = {row['id']: row for row in menu_type_rows.to_representation(menu_type_rows.values(Type.objects.filter(id__in=type_ids)))}
+        for type_id in type_ids:
+            if type_id in rows:
+                groups[type_id] = {**rows[type_id], 'foods': groups[type_id]['foods'] if type_id in groups else []}
+            else:
+                groups.pop(type_id, None)
+    if food_ids:
+        for group in groups.values():
+            group['foods'] = [food for food in group['foods'] if food['id'] not in food_ids]
+        for food in foods:
+            if food['type'] in groups:
+                insort(groups[food['type']]['foods'], food, key=itemgetter('id'))
+    data['types'] = [groups[type_id] for type_id in sorted(groups)]
+    return data
+
+
+def menu_snapshot(restaurant_id):
+    # One query while the snapshot is current; otherwise the queued changes
+    # are applied (or the menu built in full) under the snapshot's row lock.
+    # A full rebuild after MENU_SNAPSHOT_MAX_AGE also picks up bulk writes
+    # that bypass signals. None when the restaurant does not exist.
+    oldest = timezone.now()-timedelta(seconds=getattr(settings, 'MENU_SNAPSHOT_MAX_AGE', 60*60))
+    snapshot = MenuSnapshot.objects.filter(restaurant_id=restaurant_id).annotate(
+        pending=Exists(MenuChange.objects.filter(snapshot_id=OuterRef('pk')))
+    ).first()
+    if snapshot is not None and not snapshot.pending and snapshot.built_at > oldest:
+        return snapshot.data
+    with transaction.atomic():
+        snapshot = MenuSnapshot.objects.select_for_update().filter(restaurant_id=restaurant_id).first()
+        changes = list(MenuChange.objects.filter(snapshot_id=restaurant_id).values_list('id', 'food_id', 'type_id'))
+        if snapshot is None or snapshot.built_at <= oldest:
+            if snapshot is None and not Restaurant.objects.filter(id=restaurant_id).exists():
+                return None
+            data = build_menu(restaurant_id)
+            MenuSnapshot.objects.update_or_create(restaurant_id=restaurant_id, defaults={'data': data, 'built_at': timezone.now()})
+        else:
+            food_ids = {food_id for _, food_id, _ in changes if food_id is not None}
+            type_ids = {type_id for _, _, type_id in changes if type_id is not None}
+            data = patch_menu(snapshot.data, restaurant_id, food_ids, type_ids)
+            snapshot.save(update_fields=['data', 'updated_at'])
+        # Only what was read above: later changes wait for the next read.
+        MenuChange.objects.filter(id__in=[change_id for change_id, _, _ in changes]).delete()
+    return data
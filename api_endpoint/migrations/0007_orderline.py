@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:05
+
+import json
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def copy_ordered_food(apps, schema_editor):
+    Order = apps.get_model('api_endpoint', 'Order')
+    OrderLine = apps.get_model('api_endpoint', 'OrderLine')
+    Food = apps.get_model('api_endpoint', 'Food')
+    food_ids = set(Food.objects.values_list('id', flat=True))
+    lines = []
+    for order in Order.objects.exclude(ordered_food=None).iterator():
+        ordered_food = order.ordered_food
+        if isinstance(ordered_food, str):
+            ordered_food = json.loads(ordered_food) if ordered_food else {}
+        for _, item in sorted(ordered_food.items(), key=lambda pair: int(pair[0])):
+            if item['id'] not in food_ids:
+                continue
+            lines.append(OrderLine(
+                order_id=order.id,
+                food_id=item['id'],
+                number=item['number'],
+                price=Decimal(str(item['price'])),
+            ))
+    OrderLine.objects.bulk_create(lines, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_endpoint', '0006_rename_restaurant_comment_restaurant'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.SmallIntegerField(default=1)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=7)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('food', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ordered_in', to='api_endpoint.food')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='api_endpoint.order')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['order', 'id'], name='api_endpoin_order_i_18b481_idx')],
+            },
+        ),
+        migrations.RunPython(copy_ordered_food, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='order',
+            name='ordered_food',
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:15
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def fill_point_sum(apps, schema_editor):
+    Food = apps.get_model('api_endpoint', 'Food')
+    Comment = apps.get_model('api_endpoint', 'Comment')
+    foods = [
+        Food(id=row['food_id'], point_sum=row['point_sum'], no_of_comment=row['no_of_comment'])
+        for row in Comment.objects.values('food_id').annotate(point_sum=Sum('give_point'), no_of_comment=Count('id'))
+    ]
+    Food.objects.bulk_update(foods, ['point_sum', 'no_of_comment'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_endpoint', '0008_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='food',
+            name='point_sum',
+            field=models.DecimalField(decimal_places=1, default=0, max_digits=12),
+        ),
+        migrations.RunPython(fill_point_sum, migrations.RunPython.noop),
+    ]
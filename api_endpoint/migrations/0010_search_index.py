@@ -0,0 +1,61 @@
+import re
+
+from django.db import migrations
+
+# Frozen copies of the search schema and tokenizer as of this migration
+# (see api_endpoint/search.py), so later changes to the app code cannot
+# change what it does.
+KINDS = {
+    'food': ('Food', ['chinese_name', 'english_name']),
+    'type': ('Type', ['chinese_name', 'english_name']),
+    'comment': ('Comment', ['comment']),
+}
+CJK_RANGES = '぀-ヿ㐀-䶿一-鿿가-힯豈-﫿'
+TOKEN = re.compile(f'([{CJK_RANGES}]+)|([^\\W_{CJK_RANGES}]+)')
+
+
+def tokenize(text):
+    terms = []
+    for cjk, word in TOKEN.findall((text or '').lower()):
+        if word:
+            terms.append(word)
+            continue
+        terms += list(cjk)
+        terms += [cjk[i:i+2] for i in range(len(cjk)-1)]
+    return terms
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for kind, (model_name, fields) in KINDS.items():
+        table = f'api_endpoint_{kind}_search'
+        schema_editor.execute(f'CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5(terms)')
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {table}')
+            rows = []
+            for instance in apps.get_model('api_endpoint', model_name).objects.only('id', *fields).iterator(chunk_size=2000):
+                rows.append((instance.id, ' '.join(' '.join(tokenize(getattr(instance, field))) for field in fields)))
+                if len(rows) == 2000:
+                    cursor.executemany(f'INSERT INTO {table} (rowid, terms) VALUES (%s, %s)', rows)
+                    rows = []
+            if rows:
+                cursor.executemany(f'INSERT INTO {table} (rowid, terms) VALUES (%s, %s)', rows)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for kind in KINDS:
+        schema_editor.execute(f'DROP TABLE IF EXISTS api_endpoint_{kind}_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_endpoint', '0009_food_point_sum'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:46
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_unavailable(apps, schema_editor):
+    # Keep the oldest row of each (food, restaurant) pair.
+    Unavailable = apps.get_model('api_endpoint', 'Unavailable')
+    duplicates = Unavailable.objects.values('food_id', 'restaurant_id').annotate(keep=Min('id'), count=Count('id')).filter(count__gt=1)
+    for row in duplicates:
+        Unavailable.objects.filter(food_id=row['food_id'], restaurant_id=row['restaurant_id']).exclude(id=row['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_endpoint', '0010_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['food', '-created_at', '-id'], name='api_endpoin_food_id_0f9e8e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='api_endpoin_user_id_4c6389_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['restaurant', '-created_at', '-id'], name='api_endpoin_restaur_3c7090_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='food',
+            index=models.Index(fields=['type', 'price'], name='api_endpoin_type_id_d2cefb_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='food',
+            index=models.Index(fields=['price'], name='api_endpoin_price_4715dd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='food',
+            index=models.Index(fields=['ave_point'], name='api_endpoin_ave_poi_1d60d3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='table',
+            index=models.Index(condition=models.Q(('available', True)), fields=['restaurant', 'max_no'], name='table_free_idx'),
+        ),
+        migrations.RunPython(remove_duplicate_unavailable, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='unavailable',
+            constraint=models.UniqueConstraint(fields=('food', 'restaurant'), name='unique_unavailable_food_restaurant'),
+        ),
+    ]
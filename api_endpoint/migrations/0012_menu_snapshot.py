@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_endpoint', '0011_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MenuSnapshot',
+            fields=[
+                ('restaurant', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='menu_snapshot', serialize=False, to='api_endpoint.restaurant')),
+                ('data', models.JSONField()),
+                ('built_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MenuChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('food_id', models.IntegerField(null=True)),
+                ('type_id', models.IntegerField(null=True)),
+                ('snapshot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='changes', to='api_endpoint.menusnapshot')),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+from django.db import migrations
+
+
+def drop_menu_snapshots(apps, schema_editor):
+    # Stored menus still list point_sum, which food responses no longer
+    # show; each one is rebuilt on its next read.
+    apps.get_model('api_endpoint', 'MenuSnapshot').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_endpoint', '0013_task_queue'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_menu_snapshots, migrations.RunPython.noop),
+    ]
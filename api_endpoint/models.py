@@ -1,7 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
-
-import json
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
 
 # Create your models here.
 
@@ -17,6 +17,10 @@ class Table(models.Model):
     available = models.BooleanField(default=True)
     restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, related_name='own_by')
 
+    class Meta:
+        # Only free tables are searched (booking, allocation, the table list).
+        indexes = [models.Index(fields=['restaurant', 'max_no'], condition=models.Q(available=True), name='table_free_idx')]
+
     def __str__(self) -> str:
         return str(self.restaurant.name)+' '+str(self.max_no)+' table'
 
@@ -35,6 +39,14 @@ class Food(models.Model):
     ave_point = models.DecimalField(decimal_places=2, max_digits=3, default=0)
     type = models.ForeignKey(Type, on_delete=models.CASCADE, related_name='type')
     no_of_comment = models.IntegerField(default=0)
+    point_sum = models.DecimalField(decimal_places=1, max_digits=12, default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['type', 'price']),
+            models.Index(fields=['price']),
+            models.Index(fields=['ave_point']),
+        ]
 
     def __str__(self) -> str:
         return self.english_name
@@ -43,30 +55,40 @@ class Unavailable(models.Model):
     food = models.ForeignKey(Food, on_delete=models.CASCADE, related_name='unavailable_food')
     restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, related_name='unavailable_restaurant')
 
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['food', 'restaurant'], name='unique_unavailable_food_restaurant')]
+
     def __str__(self) -> str:
         return self.restaurant.name+' can not provide '+self.food.english_name
 
 class Order(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='user')
     table = models.ForeignKey(Table, on_delete=models.CASCADE, related_name='table', null=True, blank=True)
-    ordered_food = models.JSONField(null=True, blank=True)
     no_of_people = models.SmallIntegerField(default=1)
     complete = models.BooleanField(default=False)
     total_price = models.DecimalField(decimal_places=2, max_digits=7, default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
-    def set_ordered_dict(self, value):
-        self.ordered_food = json.dumps(value)
-
-    def get_ordered_food(self):
-        if not self.ordered_food:
-            return {}
-        return json.loads(self.ordered_food)
+    class Meta:
+        indexes = [models.Index(fields=['-created_at', '-id'])]
 
     def __str__(self) -> str:
         return str(self.table.restaurant.name)+' with '+str(self.no_of_people)+' '+str(self.total_price) #
 
+class OrderLine(models.Model):
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='lines')
+    food = models.ForeignKey(Food, on_delete=models.CASCADE, related_name='ordered_in')
+    number = models.SmallIntegerField(default=1)
+    price = models.DecimalField(decimal_places=2, max_digits=7)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['order', 'id'])]
+
+    def __str__(self) -> str:
+        return str(self.number)+' x '+self.food.english_name
+
 class Comment(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='writer')
     restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, related_name='place')
@@ -76,6 +98,63 @@ class Comment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        # The comment list is keyset-paginated on (-created_at, -id), alone
+        # or under a food, user or restaurant filter.
+        indexes = [
+            models.Index(fields=['-created_at', '-id']),
+            models.Index(fields=['food', '-created_at', '-id']),
+            models.Index(fields=['user', '-created_at', '-id']),
+            models.Index(fields=['restaurant', '-created_at', '-id']),
+        ]
+
     def __str__(self) -> str:
         return self.user.username+' ate '+self.food.english_name+' , gave '+str(self.give_point)
 
+
+class MenuSnapshot(models.Model):
+    # Foods grouped by type with this restaurant's availability and the
+    # ratings baked in, as served by /api/restaurant/<id>/menu.
+    restaurant = models.OneToOneField(Restaurant, on_delete=models.CASCADE, primary_key=True, related_name='menu_snapshot')
+    data = models.JSONField()
+    built_at = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return 'Menu of restaurant '+str(self.restaurant_id)
+
+class MenuChange(models.Model):
+    # A food or type to re-read into one snapshot; written in the same
+    # transaction as the change, consumed by the next read of the menu.
+    snapshot = models.ForeignKey(MenuSnapshot, on_delete=models.CASCADE, related_name='changes')
+    food_id = models.IntegerField(null=True)
+    type_id = models.IntegerField(null=True)
+
+    def __str__(self) -> str:
+        return 'Menu change of restaurant '+str(self.snapshot_id)
+
+class Task(models.Model):
+    # A call of a function by dotted path, run off the request by the task
+    # workers (api_endpoint/tasks.py). While running, run_at is the end of
+    # the worker's lease; after a failure, the time of the next attempt.
+    PENDING, RUNNING, DONE, FAILED = 'pending', 'running', 'done', 'failed'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+    name = models.CharField(max_length=200)
+    args = models.JSONField(default=list, encoder=DjangoJSONEncoder)
+    # Idempotency key: a second task with the same key is never enqueued.
+    key = models.CharField(max_length=200, unique=True, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # Workers look for due tasks by status and run_at.
+        indexes = [models.Index(fields=['status', 'run_at'])]
+
+    def __str__(self) -> str:
+        return self.name+' ('+self.status+')'
@@ -0,0 +1,153 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from rest_framework import status
+
+from .models import *
+from .serializers import OrderSerializer
+from .tables import table_index
+from .events import publish
+from .tasks import enqueue
+
+
+class BookingError(Exception):
+
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def order_queryset():
+    return OrderSerializer.setup_eager_loading(Order.objects.all())
+
+
+def restaurant_of(order):
+    return order.table.restaurant_id if order.table_id else None
+
+
+def ordered_food_lines(order):
+    return OrderLine.objects.filter(order_id=order.id).select_related('food').order_by('id')
+
+
+def money(value):
+    # Rendered like the serializers' DecimalFields, not as a JSON float.
+    return f'{value:.2f}'
+
+
+def ordered_food_detail(line):
+    return {
+        'order_no': line.id,
+        'chinese_name': line.food.chinese_name,
+        'english_name': line.food.english_name,
+        'number': line.number,
+        'price': money(line.price)
+    }
+
+
+def get_ordered_food_detail(order):
+    return [ordered_food_detail(line) for line in ordered_food_lines(order)]
+
+
+async def aget_ordered_food_detail(order):
+    return [ordered_food_detail(line) async for line in ordered_food_lines(order)]
+
+
+def add_order_line(order, food, number):
+    return add_order_lines(order, [(food, number)])[0]
+
+
+def add_order_lines(order, items):
+    lines = [OrderLine(order=order, food=food, number=number, price=food.price*number) for food, number in items]
+    if not lines:
+        return lines
+    with transaction.atomic():
+        lines = OrderLine.objects.bulk_create(lines)
+        Order.objects.filter(id=order.id).update(total_price=F('total_price')+sum(line.price for line in lines), updated_at=timezone.now())
+        publish('order.items_added', {
+            'order_id': order.id,
+            'table_id': order.table_id,
+            'lines': [{'order_no': line.id, 'food_id': line.food_id, 'number': line.number, 'price': line.price} for line in lines],
+        }, restaurant_of(order), order.id)
+    return lines
+
+
+def remove_order_line(order, order_no):
+    with transaction.atomic():
+        line = OrderLine.objects.select_for_update().filter(id=order_no, order_id=order.id).first()
+        if line is None:
+            return None
+        deleted, _ = OrderLine.objects.filter(id=line.id).delete()
+        if deleted:
+            Order.objects.filter(id=order.id).update(total_price=F('total_price')-line.price, updated_at=timezone.now())
+            publish('order.item_removed', {'order_id': order.id, 'table_id': order.table_id, 'order_no': line.id, 'price': line.price}, restaurant_of(order), order.id)
+    return line
+
+
+def book_table(user, table_id, no_of_people):
+    # The conditional UPDATE is the claim: only one booking can flip available.
+    with transaction.atomic():
+        claimed = Table.objects.filter(id=table_id, available=True, max_no__gte=no_of_people).update(available=False)
+        if not claimed:
+            table = Table.objects.filter(id=table_id).first()
+            if table is None:
+                raise BookingError('Table id does not exist', status.HTTP_404_NOT_FOUND)
+            if no_of_people > table.max_no:
+                raise BookingError(f'The max. load of this table ({table.max_no}) is smaller than {no_of_people}.', status.HTTP_404_NOT_FOUND)
+            table_index.discard(table)
+            raise BookingError('This table is not available now. Please choice other table.', status.HTTP_409_CONFLICT)
+        order = Order.objects.create(user=user, table_id=table_id, no_of_people=no_of_people)
+        order = order_queryset().get(id=order.id)
+        transaction.on_commit(lambda: table_index.discard(order.table))
+        restaurant_id = order.table.restaurant_id
+        publish('table.claimed', {'table_id': table_id, 'restaurant_id': restaurant_id, 'order_id': order.id, 'no_of_people': no_of_people}, restaurant_id, order.id)
+    return order
+
+
+def allocate_table(user, restaurant_id, no_of_people):
+    reloaded = False
+    for attempt in range(getattr(settings, 'TABLE_ALLOCATE_ATTEMPTS', 20)):
+        table_id = table_index.best_fit(restaurant_id, no_of_people)
+        if table_id is None:
+            if reloaded:
+                raise BookingError(f'No free table for {no_of_people} people in this restaurant now.', status.HTTP_404_NOT_FOUND)
+            # Tables may have been freed elsewhere since the index was loaded.
+            table_index.reload(restaurant_id)
+            reloaded = True
+            continue
+        try:
+            return book_table(user, table_id, no_of_people)
+        except BookingError as e:
+            if e.status_code == status.HTTP_409_CONFLICT:
+                # book_table drops the table by its current size; an entry left
+                # from before a resize elsewhere goes by id.
+                table_index.remove_id(table_id)
+            else:
+                # A deleted or resized table means the index is stale.
+                table_index.reload(restaurant_id)
+                reloaded = True
+    raise BookingError('Tables are being booked too fast. Please try again.', status.HTTP_409_CONFLICT)
+
+
+def complete_order(order):
+    with transaction.atomic():
+        Order.objects.filter(id=order.id).update(complete=True, updated_at=timezone.now())
+        publish('order.completed', {'order_id': order.id, 'table_id': order.table_id}, restaurant_of(order), order.id)
+        # Concurrent completions of one order enqueue the follow-up once.
+        enqueue(finish_order, [order.id], key=f'order:complete:{order.id}')
+    order.refresh_from_db(fields=['complete', 'updated_at'])
+    return order
+
+
+def finish_order(order_id):
+    # The side effects of a completed order, run by the task workers:
+    # releasing its table (receipts and sales rollups belong here too).
+    order = order_queryset().filter(id=order_id).first()
+    if order is None or not order.table_id:
+        return
+    Table.objects.filter(id=order.table_id).update(available=True)
+    order.table.available = True
+    transaction.on_commit(lambda: table_index.add(order.table))
+    publish('table.released', {'table_id': order.table_id, 'restaurant_id': order.table.restaurant_id, 'order_id': order.id}, order.table.restaurant_id, order.id)
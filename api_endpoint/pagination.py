@@ -0,0 +1,20 @@
+from rest_framework.pagination import CursorPagination
+
+
+class KeysetPagination(CursorPagination):
+    # Cursor pages seek on the ordering columns (backed by an index) instead of OFFSET.
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = ('-created_at', '-id')
+
+    def get_paginated_data(self, key, data):
+        return {
+            key: data,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link()
+        }
+
+
+class FoodPagination(KeysetPagination):
+    ordering = ('id',)
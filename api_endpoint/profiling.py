@@ -0,0 +1,278 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from rest_framework.serializers import BaseSerializer
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (ms) of the latency histogram buckets; the last one is open ended.
+BUCKETS = [1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, float('inf')]
+IN_LIST = re.compile(r'\((?:%s, )*%s\)')
+
+
+def query_shape(sql):
+    return IN_LIST.sub('(...)', sql)
+
+
+class QueryRecorder:
+
+    def __init__(self):
+        self.count = 0
+        self.time = 0
+        self.shapes = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.time += time.perf_counter()-start
+            self.count += 1
+            shape = query_shape(sql)
+            self.shapes[shape] = self.shapes.get(shape, 0)+1
+
+
+class SerializerTimer:
+    # Time a request spends building serializer output, less the queries run
+    # from inside it (lazy querysets, prefetches), which sql_ms already has.
+
+    def __init__(self, recorder):
+        self.recorder = recorder
+        self.time = 0
+        self.depth = 0
+
+
+serializer_timer = ContextVar('serializer_timer', default=None)
+
+
+def timed_serialization(func):
+    @wraps(func)
+    def timed(*args, **kwargs):
+        timer = serializer_timer.get()
+        if timer is None or timer.depth:
+            return func(*args, **kwargs)
+        timer.depth += 1
+        start, sql = time.perf_counter(), timer.recorder.time
+        try:
+            return func(*args, **kwargs)
+        finally:
+            timer.time += time.perf_counter()-start-(timer.recorder.time-sql)
+            timer.depth -= 1
+    return timed
+
+
+def time_serializers():
+    # Serializer.data and ListSerializer.data both go through
+    # BaseSerializer.data; ValuesSerializer is timed where it is defined.
+    if not getattr(BaseSerializer.data.fget, '__wrapped__', None):
+        BaseSerializer.data = property(timed_serialization(BaseSerializer.data.fget))
+
+
+class ProfileStore:
+    # Per-route aggregates for this process. Each process writes its own
+    # snapshot file so the profiling_report command can merge them.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+        self._flushed = time.monotonic()
+
+    def record(self, route, total, recorder, serialize, render, repeated):
+        with self._lock:
+            stats = self._routes.setdefault(route, new_stats())
+            stats['count'] += 1
+            stats['total_ms'] += total*1000
+            stats['sql_count'] += recorder.count
+            stats['sql_ms'] += recorder.time*1000
+            stats['serialize_ms'] += serialize*1000
+            stats['render_ms'] += render*1000
+            stats['max_sql_count'] = max(stats['max_sql_count'], recorder.count)
+            stats['buckets'][bucket(total*1000)] += 1
+            if repeated:
+                stats['n_plus_one'] += 1
+                examples = stats['n_plus_one_examples']
+                for shape, repeats in repeated.items():
+                    if shape in examples or len(examples) < 5:
+                        examples[shape] = max(examples.get(shape, 0), repeats)
+        self.maybe_flush()
+
+    def snapshot(self):
+        with self._lock:
+            return json.loads(json.dumps(self._routes))
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+        path = snapshot_path()
+        if path and os.path.exists(path):
+            os.remove(path)
+
+    def maybe_flush(self):
+        path = snapshot_path()
+        if not path or time.monotonic()-self._flushed < getattr(settings, 'PROFILING_FLUSH_INTERVAL', 10):
+            return
+        self._flushed = time.monotonic()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path+'.tmp', 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(path+'.tmp', path)
+
+
+def new_stats():
+    return {
+        'count': 0, 'total_ms': 0, 'sql_count': 0, 'sql_ms': 0, 'serialize_ms': 0, 'render_ms': 0, 'max_sql_count': 0,
+        'buckets': [0]*len(BUCKETS), 'n_plus_one': 0, 'n_plus_one_examples': {},
+    }
+
+
+def bucket(ms):
+    for i, bound in enumerate(BUCKETS):
+        if ms <= bound:
+            return i
+
+
+def snapshot_path():
+    directory = getattr(settings, 'PROFILING_DIR', None)
+    if not directory:
+        return None
+    return os.path.join(directory, f'profile-{os.getpid()}.json')
+
+
+def merge(snapshots):
+    routes = {}
+    for snapshot in snapshots:
+        for route, stats in snapshot.items():
+            merged = routes.setdefault(route, new_stats())
+            for key in ['count', 'total_ms', 'sql_count', 'sql_ms', 'serialize_ms', 'render_ms', 'n_plus_one']:
+                # Snapshots written before serialize_ms existed lack it.
+                merged[key] += stats.get(key, 0)
+            merged['max_sql_count'] = max(merged['max_sql_count'], stats['max_sql_count'])
+            merged['buckets'] = [a+b for a, b in zip(merged['buckets'], stats['buckets'])]
+            for shape, repeats in stats['n_plus_one_examples'].items():
+                merged['n_plus_one_examples'][shape] = max(merged['n_plus_one_examples'].get(shape, 0), repeats)
+    return routes
+
+
+def percentile(buckets, fraction):
+    # Upper bound of the bucket holding the requested rank.
+    total = sum(buckets)
+    if not total:
+        return 0
+    seen = 0
+    for i, n in enumerate(buckets):
+        seen += n
+        if seen >= total*fraction:
+            return BUCKETS[i]
+
+
+def report(routes):
+    rows = []
+    for route, stats in sorted(routes.items()):
+        count = stats['count'] or 1
+        rows.append({
+            'route': route,
+            'count': stats['count'],
+            'mean_ms': round(stats['total_ms']/count, 2),
+            'p50_ms': percentile(stats['buckets'], 0.5),
+            'p99_ms': percentile(stats['buckets'], 0.99),
+            'mean_sql_count': round(stats['sql_count']/count, 2),
+            'max_sql_count': stats['max_sql_count'],
+            'mean_sql_ms': round(stats['sql_ms']/count, 2),
+            'mean_serialize_ms': round(stats['serialize_ms']/count, 2),
+            'mean_render_ms': round(stats['render_ms']/count, 2),
+            'n_plus_one': stats['n_plus_one'],
+            'n_plus_one_examples': stats['n_plus_one_examples'],
+            'histogram': dict(zip([str(bound) for bound in BUCKETS], stats['buckets'])),
+        })
+    return rows
+
+
+profile_store = ProfileStore()
+
+
+def start_recording(recorder):
+    stack = ExitStack()
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(recorder))
+    return stack
+
+
+class ProfilingMiddleware:
+    # Records SQL count/time, serializer and render time and total latency
+    # per route and flags repeated identical query shapes (N+1). Enabled by
+    # PROFILING.
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        time_serializers()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not getattr(settings, 'PROFILING', False):
+            return self.get_response(request)
+        recorder = QueryRecorder()
+        timer = SerializerTimer(recorder)
+        token = serializer_timer.set(timer)
+        request._profiling_render = 0
+        start = time.perf_counter()
+        try:
+            with start_recording(recorder):
+                response = self.get_response(request)
+        finally:
+            serializer_timer.reset(token)
+        return self.record(request, response, recorder, timer, time.perf_counter()-start)
+
+    async def __acall__(self, request):
+        if not getattr(settings, 'PROFILING', False):
+            return await self.get_response(request)
+        recorder = QueryRecorder()
+        timer = SerializerTimer(recorder)
+        # sync_to_async copies the context, so the view's thread shares timer.
+        token = serializer_timer.set(timer)
+        request._profiling_render = 0
+        start = time.perf_counter()
+        # Connections are per thread: the wrappers go on the ones the ORM
+        # uses from this request's sync_to_async thread.
+        stack = await sync_to_async(start_recording)(recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+            serializer_timer.reset(token)
+        return self.record(request, response, recorder, timer, time.perf_counter()-start)
+
+    def record(self, request, response, recorder, timer, total):
+        threshold = getattr(settings, 'PROFILING_N_PLUS_ONE_THRESHOLD', 5)
+        repeated = {shape: n for shape, n in recorder.shapes.items() if n >= threshold}
+        match = getattr(request, 'resolver_match', None)
+        route = f'{request.method} {match.route if match else request.path}'
+        if repeated:
+            logger.warning('Possible N+1 on %s: %s', route, repeated)
+        profile_store.record(route, total, recorder, timer.time, request._profiling_render, repeated)
+        response['X-Query-Count'] = str(recorder.count)
+        return response
+
+    def process_template_response(self, request, response):
+        if not getattr(settings, 'PROFILING', False):
+            return response
+        start = time.perf_counter()
+
+        def rendered(response):
+            request._profiling_render = time.perf_counter()-start
+        response.add_post_render_callback(rendered)
+        return response
@@ -0,0 +1,65 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from .models import *
+from .cache import bump_menu_version
+from .menus import record_change
+from .tasks import enqueue, task_name
+
+
+def average(point_sum, no_of_comment):
+    if no_of_comment <= 0:
+        return Decimal(0)
+    return (Decimal(point_sum)/no_of_comment).quantize(Decimal('0.01'))
+
+
+def _update_rating(food_id, point, count):
+    # The totals move in one UPDATE whose right-hand sides read the row as
+    # it was before it, so concurrent reviews cannot overwrite each other.
+    # The row stays locked until commit, so the average is taken in Python
+    # from exactly these totals, with decimal arithmetic.
+    with transaction.atomic():
+        foods = Food.objects.filter(id=food_id)
+        foods.update(point_sum=F('point_sum')+point, no_of_comment=F('no_of_comment')+count)
+        totals = foods.values_list('point_sum', 'no_of_comment').first()
+        if totals is not None:
+            foods.update(ave_point=average(*totals))
+    record_change(food_ids=[food_id])
+    transaction.on_commit(bump_menu_version)
+
+
+def apply_rating(food_id, give_point, count):
+    # count is 1 for a new comment and -1 for a deleted one.
+    _update_rating(food_id, Decimal(give_point)*count, count)
+
+
+def enqueue_rating(comment, count):
+    # Run by the task workers; the key keeps a comment from counting twice.
+    action = 'add' if count > 0 else 'remove'
+    enqueue(apply_rating, [comment.food_id, comment.give_point, count], key=f'rating:{action}:{comment.id}')
+
+
+def rebuild_ratings():
+    with transaction.atomic():
+        # Queued rating tasks are already in the totals; a running one fails
+        # to mark itself done and rolls back.
+        Task.objects.filter(name=task_name(apply_rating), status__in=[Task.PENDING, Task.RUNNING]).update(
+            status=Task.DONE, last_error='Superseded by rebuild_ratings.', updated_at=timezone.now(),
+        )
+        totals = Comment.objects.values('food_id').annotate(point_sum=Sum('give_point'), no_of_comment=Count('id'))
+        foods = []
+        for row in totals:
+            foods.append(Food(
+                id=row['food_id'],
+                point_sum=row['point_sum'],
+                no_of_comment=row['no_of_comment'],
+                ave_point=average(row['point_sum'], row['no_of_comment']),
+            ))
+        Food.objects.update(point_sum=0, no_of_comment=0, ave_point=0)
+        Food.objects.bulk_update(foods, ['point_sum', 'no_of_comment', 'ave_point'], batch_size=1000)
+        # Every rating may have moved; snapshots are rebuilt on their next read.
+        MenuSnapshot.objects.all().delete()
+    transaction.on_commit(bump_menu_version)
+    return len(foods)
@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.utils.encoding import force_str
+from rest_framework import renderers
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# orjson writes str/int/float/bool/None, dicts and lists (subclasses too),
+# datetimes, dates, times and UUIDs itself, in the same form as DRF's
+# encoder; everything else (Decimal, lazy strings, querysets, ...) goes
+# through DRF's encoder so the output stays the same as JSONRenderer's.
+ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS if orjson else 0
+LINE_SEPARATORS = ('\u2028'.encode(), '\u2029'.encode())
+fallback_default = encoders.JSONEncoder().default
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+    # Drop-in JSONRenderer backed by orjson when it is installed. Pretty
+    # printing, ensure_ascii and non-compact output use the stdlib path.
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        ret = orjson.dumps(data, default=fallback_default, option=ORJSON_OPTIONS)
+        # Same JavaScript-safe escaping of U+2028/U+2029 as JSONRenderer.
+        if b'\xe2\x80' in ret:
+            ret = ret.replace(LINE_SEPARATORS[0], b'\\u2028').replace(LINE_SEPARATORS[1], b'\\u2029')
+        return ret
+
+
+class FastJSONParser(JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or encoding.lower().replace('-', '') != 'utf8':
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % force_str(exc))
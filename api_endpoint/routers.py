@@ -0,0 +1,105 @@
+import contextvars
+import random
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# Credentials and sessions are always read where they were just written.
+PRIMARY_APPS = {'auth', 'authtoken', 'sessions', 'contenttypes'}
+PIN_COOKIE = 'replica_pin'
+
+_read_from_replica = contextvars.ContextVar('read_from_replica', default=False)
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+@contextmanager
+def use_primary():
+    # For reads whose result outlives the request (menu cache entries,
+    # in-process indexes): a lagging replica would freeze stale data there.
+    token = _read_from_replica.set(False)
+    try:
+        yield
+    finally:
+        _read_from_replica.reset(token)
+
+
+class ReplicaRouter:
+    # Reads go to a random replica only while ReplicaRoutingMiddleware has
+    # marked the request as a safe one from a client that has not written
+    # recently; everything else, and every write, uses the primary.
+
+    def db_for_read(self, model, **hints):
+        if _read_from_replica.get() and replicas() and model._meta.app_label not in PRIMARY_APPS:
+            return random.choice(replicas())
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in replicas()
+
+
+def pin_seconds():
+    return getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+
+
+def is_pinned(request):
+    # The signed timestamp stops a client from keeping or forging the pin
+    # past REPLICA_PIN_SECONDS, whatever its cookie jar does.
+    return request.get_signed_cookie(PIN_COOKIE, default=None, salt=PIN_COOKIE, max_age=pin_seconds()) is not None
+
+
+class ReplicaRoutingMiddleware:
+    # Read-your-writes: a client that changed something is served from the
+    # primary for REPLICA_PIN_SECONDS, longer than replication normally lags.
+    # The pin is a signed cookie, so every process sees it without a shared
+    # cache.
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not replicas():
+            return self.get_response(request)
+        if request.method not in SAFE_METHODS:
+            return self.pin(self.get_response(request))
+        token = _read_from_replica.set(not is_pinned(request))
+        try:
+            return self.get_response(request)
+        finally:
+            _read_from_replica.reset(token)
+
+    async def __acall__(self, request):
+        if not replicas():
+            return await self.get_response(request)
+        if request.method not in SAFE_METHODS:
+            return self.pin(await self.get_response(request))
+        token = _read_from_replica.set(not is_pinned(request))
+        try:
+            return await self.get_response(request)
+        finally:
+            _read_from_replica.reset(token)
+
+    def pin(self, response):
+        if response.status_code < 400:
+            response.set_signed_cookie(
+                PIN_COOKIE, '1', salt=PIN_COOKIE, max_age=pin_seconds(),
+                secure=settings.SESSION_COOKIE_SECURE, httponly=True, samesite='Lax',
+            )
+        return response
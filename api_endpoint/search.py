@@ -0,0 +1,167 @@
+import re
+from functools import reduce
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+from .models import *
+
+# Han, kana and hangul have no spaces between words, so runs of them are
+# indexed as single characters plus overlapping bigrams and a query matches
+# on its bigrams. Everything else is split into ordinary words.
+CJK_RANGES = '぀-ヿ㐀-䶿一-鿿가-힯豈-﫿'
+TOKEN = re.compile(f'([{CJK_RANGES}]+)|([^\\W_{CJK_RANGES}]+)')
+
+SEARCH_FIELDS = {
+    'food': (Food, ['chinese_name', 'english_name']),
+    'type': (Type, ['chinese_name', 'english_name']),
+    'comment': (Comment, ['comment']),
+}
+
+
+def tokenize(text):
+    terms = []
+    for cjk, word in TOKEN.findall((text or '').lower()):
+        if word:
+            terms.append(word)
+            continue
+        terms += list(cjk)
+        terms += [cjk[i:i+2] for i in range(len(cjk)-1)]
+    return terms
+
+
+def query_terms(text):
+    terms = []
+    for cjk, word in TOKEN.findall((text or '').lower()):
+        if word:
+            terms.append((word, True))
+        elif len(cjk) == 1:
+            terms.append((cjk, False))
+        else:
+            terms += [(cjk[i:i+2], False) for i in range(len(cjk)-1)]
+    return terms
+
+
+def document(instance, kind):
+    _, fields = SEARCH_FIELDS[kind]
+    return ' '.join(' '.join(tokenize(getattr(instance, field))) for field in fields)
+
+
+class ScanBackend:
+    # Fallback for databases without a full-text index: the old icontains scan.
+
+    def match_ids(self, kind, query):
+        model, fields = SEARCH_FIELDS[kind]
+        condition = reduce(lambda a, b: a | b, [Q(**{f'{field}__icontains': query}) for field in fields])
+        return model.objects.filter(condition).values('id')
+
+    def filter(self, queryset, kind, query):
+        return queryset.filter(id__in=self.match_ids(kind, query))
+
+    def search(self, kind, query, limit=20):
+        model, _ = SEARCH_FIELDS[kind]
+        return list(self.filter(model.objects.all(), kind, query).order_by('id')[:limit])
+
+    def index(self, instance, kind):
+        pass
+
+    def remove(self, instance, kind):
+        pass
+
+    def rebuild(self, kind, model=None, schema_editor=None):
+        return 0
+
+    def index_documents(self, kind, documents):
+        pass
+
+
+class SQLiteFTSBackend(ScanBackend):
+    # One FTS5 table per kind whose rowid is the model id and whose single
+    # column holds the tokenized text; bm25 ranks the matches.
+
+    def table(self, kind):
+        return f'api_endpoint_{kind}_search'
+
+    def match(self, query):
+        terms = query_terms(query)
+        if not terms:
+            return None
+        return ' AND '.join(f'"{term}"*' if prefix else f'"{term}"' for term, prefix in terms)
+
+    def match_ids(self, kind, query):
+        match = self.match(query)
+        if match is None:
+            return []
+        table = self.table(kind)
+        return RawSQL(f'SELECT rowid FROM {table} WHERE {table} MATCH %s', [match])
+
+    def search(self, kind, query, limit=20):
+        model, _ = SEARCH_FIELDS[kind]
+        match = self.match(query)
+        if match is None:
+            return []
+        table = self.table(kind)
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT rowid FROM {table} WHERE {table} MATCH %s ORDER BY rank LIMIT %s', [match, limit])
+            ids = [row[0] for row in cursor.fetchall()]
+        objects = model.objects.in_bulk(ids)
+        return [objects[id] for id in ids if id in objects]
+
+    def index(self, instance, kind):
+        table = self.table(kind)
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {table} WHERE rowid = %s', [instance.id])
+            cursor.execute(f'INSERT INTO {table} (rowid, terms) VALUES (%s, %s)', [instance.id, document(instance, kind)])
+
+    def remove(self, instance, kind):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table(kind)} WHERE rowid = %s', [instance.id])
+
+    def rebuild(self, kind, model=None, schema_editor=None):
+        default_model, fields = SEARCH_FIELDS[kind]
+        model = model or default_model
+        db = schema_editor.connection if schema_editor else connection
+        with db.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table(kind)}')
+        count, rows = 0, []
+        for instance in model.objects.only('id', *fields).iterator(chunk_size=2000):
+            rows.append((instance.id, document(instance, kind)))
+            if len(rows) == 2000:
+                count += self.insert(kind, rows, db)
+                rows = []
+        return count+self.insert(kind, rows, db)
+
+    def index_documents(self, kind, documents):
+        # documents are (id, raw text) pairs for rows that are not indexed yet.
+        terms = {}
+        rows = []
+        for id, text in documents:
+            if text not in terms:
+                terms[text] = ' '.join(tokenize(text))
+            rows.append((id, terms[text]))
+        return self.insert(kind, rows)
+
+    def insert(self, kind, rows, db=connection):
+        if rows:
+            with db.cursor() as cursor:
+                cursor.executemany(f'INSERT INTO {self.table(kind)} (rowid, terms) VALUES (%s, %s)', rows)
+        return len(rows)
+
+
+_backend = None
+
+
+def get_search_backend():
+    global _backend
+    if _backend is None:
+        path = getattr(settings, 'SEARCH_BACKEND', None)
+        if path:
+            _backend = import_string(path)()
+        elif connection.vendor == 'sqlite':
+            _backend = SQLiteFTSBackend()
+        else:
+            _backend = ScanBackend()
+    return _backend
@@ -1,6 +1,35 @@
-from rest_framework import serializers
+import decimal
+from datetime import datetime
+from decimal import Decimal
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import prefetch_related_objects
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
 
 from .models import *
+from .profiling import timed_serialization
+
+class EagerLoadingMixin:
+    # Relations the nested fields walk, loaded up front so serializing a
+    # list costs a fixed number of queries whatever its length.
+    select_related = []
+    prefetch_related = []
+
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        if cls.select_related:
+            queryset = queryset.select_related(*cls.select_related)
+        if cls.prefetch_related:
+            queryset = queryset.prefetch_related(*cls.prefetch_related)
+        return queryset
+
+    @classmethod
+    def load_related(cls, instances):
+        # Same plan for instances that were fetched some other way.
+        prefetch_related_objects(instances, *cls.select_related, *cls.prefetch_related)
+        return instances
 
 class RestaurantByTableSerializer(serializers.ModelSerializer):
     class Meta:
@@ -11,7 +40,8 @@ class RestaurantByTableSerializer(serializers.ModelSerializer):
             'location': {'read_only': True}
         }
 
-class TableSerializer(serializers.ModelSerializer):
+class TableSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related = ['restaurant']
     restaurant = serializers.PrimaryKeyRelatedField(queryset=Restaurant.objects.all(), write_only=True) #write
     restaurant_info = RestaurantByTableSerializer(source='restaurant', read_only=True) # read
     class Meta:
@@ -19,7 +49,9 @@ class TableSerializer(serializers.ModelSerializer):
         fields = '__all__'
         # exclude = ['max_no']
 
-class RestaurantSerializer(serializers.ModelSerializer):
+class RestaurantSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    # Prefetching own_by also fills each table's restaurant for restaurant_info.
+    prefetch_related = ['own_by']
     own_by = TableSerializer(many=True, read_only=True)
     class Meta:
         model = Restaurant
@@ -28,9 +60,12 @@ class RestaurantSerializer(serializers.ModelSerializer):
 class FoodByTypeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Food
-        fields = '__all__'
+        # Ratings are kept by ratings.py; point_sum is its running total.
+        exclude = ['point_sum']
+        read_only_fields = ['ave_point', 'no_of_comment']
 
-class TypeSerializer(serializers.ModelSerializer):
+class TypeSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    prefetch_related = ['type']
     type = FoodByTypeSerializer(many=True, read_only=True)
     class Meta:
         model = Type
@@ -41,22 +76,22 @@ class TypeByFoodSerializer(serializers.ModelSerializer):
         model = Type
         fields = ['id', 'chinese_name', 'english_name']
 
-class FoodSerializer(serializers.ModelSerializer):
+class FoodSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related = ['type']
     type = serializers.PrimaryKeyRelatedField(queryset=Type.objects.all(), write_only=True)
     type_info = TypeByFoodSerializer(source='type', read_only=True)
     class Meta:
         model = Food
-        fields = '__all__'
-        extra_kwargs = {
-            'ave_point': {'read_only': True},
-        }
+        exclude = ['point_sum']
+        read_only_fields = ['ave_point', 'no_of_comment']
 
 class FoodByOrderSerializer(serializers.ModelSerializer):
     class Meta:
         model = Food
-        exclude = ['type']
+        exclude = ['type', 'point_sum']
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related = ['table__restaurant']
     user = serializers.PrimaryKeyRelatedField(
 			queryset=User.objects.all(),
 			default=serializers.CurrentUserDefault()
@@ -66,7 +101,8 @@ class OrderSerializer(serializers.ModelSerializer):
         model = Order
         fields = '__all__'
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related = ['food']
     food = FoodByOrderSerializer()
     user = serializers.PrimaryKeyRelatedField(
         queryset = User.objects.all(),
@@ -83,3 +119,95 @@ class UnavailableSerializer(serializers.ModelSerializer):
     class Meta:
         model = Unavailable
         fields = '__all__'
+
+# Fields whose to_representation returns the database value unchanged.
+PASSTHROUGH_FIELDS = (serializers.CharField, serializers.IntegerField, serializers.BooleanField, serializers.PrimaryKeyRelatedField)
+
+def value_mapper(field):
+    # Same output as field.to_representation, with the per-value lookups
+    # (decimal context, current timezone) done once per response.
+    if isinstance(field, PASSTHROUGH_FIELDS):
+        return None
+    coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+    if isinstance(field, serializers.DecimalField) and coerce_to_string and not field.localize and not field.normalize_output and field.decimal_places is not None:
+        context = decimal.getcontext().copy()
+        if field.max_digits is not None:
+            context.prec = field.max_digits
+        exponent = Decimal('.1')**field.decimal_places
+        rounding = field.rounding
+
+        def to_decimal(value):
+            if isinstance(value, Decimal):
+                return format(value.quantize(exponent, rounding=rounding, context=context), 'f')
+            return field.to_representation(value)
+        return to_decimal
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    if isinstance(field, serializers.DateTimeField) and isinstance(output_format, str) and output_format.lower() == ISO_8601:
+        field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+
+        def to_datetime(value):
+            if field_timezone is not None and isinstance(value, datetime) and timezone.is_aware(value):
+                value = value.astimezone(field_timezone).isoformat()
+                return value[:-6]+'Z' if value.endswith('+00:00') else value
+            return field.to_representation(value)
+        return to_datetime
+    return field.to_representation
+
+class ValuesSerializer:
+    # Read-only twin of a ModelSerializer for hot list endpoints. The field
+    # tree is compiled once into (key, lookup, field) steps over .values()
+    # rows, so serializing a row is one dict build with no get_attribute
+    # calls or model instances. Output matches the original serializer.
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+        self.lookups = []
+        self.plan = self.compile(serializer_class(), '')
+
+    def compile(self, serializer, prefix):
+        plan = []
+        for field in serializer._readable_fields:
+            if isinstance(field, serializers.ListSerializer) or field.source == '*' or '.' in field.source:
+                raise ImproperlyConfigured(f'{self.serializer_class.__name__}.{field.field_name} cannot be read from values().')
+            if isinstance(field, serializers.BaseSerializer):
+                nested = prefix+field.source+'__'
+                pk = nested+field.Meta.model._meta.pk.attname
+                self.add_lookup(pk)
+                plan.append((field.field_name, pk, self.compile(field, nested)))
+                continue
+            lookup = prefix+field.source
+            self.add_lookup(lookup)
+            plan.append((field.field_name, lookup, field))
+        return plan
+
+    def add_lookup(self, lookup):
+        if lookup not in self.lookups:
+            self.lookups.append(lookup)
+
+    def values(self, queryset):
+        return queryset.values(*self.lookups)
+
+    def prepare(self, plan):
+        return [(key, lookup, self.prepare(field) if isinstance(field, list) else value_mapper(field)) for key, lookup, field in plan]
+
+    def build(self, plan, row):
+        data = {}
+        for key, lookup, mapper in plan:
+            value = row[lookup]
+            if value is None or mapper is None:
+                data[key] = value
+            elif isinstance(mapper, list):
+                data[key] = self.build(mapper, row)
+            else:
+                data[key] = mapper(value)
+        return data
+
+    @timed_serialization
+    def to_representation(self, rows):
+        plan = self.prepare(self.plan)
+        return [self.build(plan, row) for row in rows]
+
+food_rows = ValuesSerializer(FoodSerializer)
+comment_rows = ValuesSerializer(CommentSerializer)
+menu_type_rows = ValuesSerializer(TypeByFoodSerializer)
+menu_food_rows = ValuesSerializer(FoodByTypeSerializer)
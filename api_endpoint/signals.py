@@ -0,0 +1,113 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .models import *
+from .tables import table_index
+from .cache import bump_menu_version
+from .availability import bump_availability_version
+from .events import publish
+from .authentication import token_cache
+from .menus import record_change
+from .search import SEARCH_FIELDS, get_search_backend
+
+SEARCH_KINDS = {model: kind for kind, (model, _) in SEARCH_FIELDS.items()}
+
+
+@receiver(post_save, sender=Table)
+def update_table_index(sender, instance, **kwargs):
+    # After commit, like bookings, so a rolled back edit never reaches the index.
+    def update():
+        table_index.remove_id(instance.id)
+        if instance.available:
+            table_index.add(instance)
+    transaction.on_commit(update)
+
+
+@receiver(post_delete, sender=Table)
+def remove_table_index(sender, instance, **kwargs):
+    transaction.on_commit(lambda: table_index.remove_id(instance.id))
+
+
+@receiver(post_save, sender=Table)
+def publish_table_update(sender, instance, **kwargs):
+    # Admin edits; bookings claim and release tables with UPDATEs in orders.py.
+    publish('table.updated', {'table_id': instance.id, 'restaurant_id': instance.restaurant_id, 'max_no': instance.max_no, 'available': instance.available}, instance.restaurant_id)
+
+
+@receiver(post_delete, sender=Table)
+def publish_table_delete(sender, instance, **kwargs):
+    publish('table.deleted', {'table_id': instance.id, 'restaurant_id': instance.restaurant_id}, instance.restaurant_id)
+
+
+@receiver(post_save, sender=Food)
+@receiver(post_delete, sender=Food)
+@receiver(post_save, sender=Type)
+@receiver(post_delete, sender=Type)
+@receiver(post_save, sender=Unavailable)
+@receiver(post_delete, sender=Unavailable)
+def invalidate_menu_cache(sender, **kwargs):
+    # Bumped before commit, a concurrent read could cache the old rows
+    # under the new version.
+    transaction.on_commit(bump_menu_version)
+
+
+@receiver(post_save, sender=Unavailable)
+@receiver(post_delete, sender=Unavailable)
+def invalidate_availability_index(sender, **kwargs):
+    transaction.on_commit(bump_availability_version)
+
+
+@receiver(post_save, sender=Food)
+@receiver(post_delete, sender=Food)
+def record_food_change(sender, instance, **kwargs):
+    record_change(food_ids=[instance.id])
+
+
+@receiver(post_save, sender=Type)
+@receiver(post_delete, sender=Type)
+def record_type_change(sender, instance, **kwargs):
+    record_change(type_ids=[instance.id])
+
+
+@receiver(pre_save, sender=Unavailable)
+def record_unavailable_move(sender, instance, **kwargs):
+    # An edited row may have pointed at another food or restaurant before.
+    if instance.pk:
+        old = Unavailable.objects.filter(pk=instance.pk).values_list('food_id', 'restaurant_id').first()
+        if old:
+            record_change(food_ids=[old[0]], restaurant_id=old[1])
+
+
+@receiver(post_save, sender=Unavailable)
+@receiver(post_delete, sender=Unavailable)
+def record_unavailable_change(sender, instance, **kwargs):
+    record_change(food_ids=[instance.food_id], restaurant_id=instance.restaurant_id)
+
+
+@receiver(post_save, sender=Food)
+@receiver(post_save, sender=Type)
+@receiver(post_save, sender=Comment)
+def update_search_index(sender, instance, **kwargs):
+    get_search_backend().index(instance, SEARCH_KINDS[sender])
+
+
+@receiver(post_delete, sender=Food)
+@receiver(post_delete, sender=Type)
+@receiver(post_delete, sender=Comment)
+def remove_search_index(sender, instance, **kwargs):
+    get_search_backend().remove(instance, SEARCH_KINDS[sender])
+
+
+@receiver(post_delete, sender=Token)
+def forget_token(sender, instance, **kwargs):
+    # djoser's token/logout deletes the user's tokens.
+    token_cache.invalidate(instance.key)
+
+
+@receiver(post_save, sender=User)
+def forget_user_tokens(sender, instance, **kwargs):
+    # Deactivation, superuser changes and the rest take effect on the next request.
+    token_cache.invalidate_user(instance.id)
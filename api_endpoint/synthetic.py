@@ -0,0 +1,260 @@
+import random
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import timedelta, timezone as dt_timezone
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import *
+from .cache import bump_menu_version
+from .availability import bump_availability_version
+from .ratings import average
+from .search import get_search_backend
+from .tables import table_index
+
+SCALES = {
+    'small': dict(restaurants=5, tables=20, types=8, foods=200, users=200, orders=2000, comments=5000),
+    'medium': dict(restaurants=20, tables=30, types=12, foods=2000, users=5000, orders=50000, comments=100000),
+    'large': dict(restaurants=100, tables=40, types=20, foods=100000, users=50000, orders=500000, comments=1000000),
+}
+
+WORDS = ['beef', 'pork', 'chicken', 'shrimp', 'noodle', 'rice', 'soup', 'fried', 'steamed', 'roast', 'curry', 'tofu']
+CJK = ['牛肉', '豬肉', '雞', '蝦', '麵', '飯', '湯', '炒', '蒸', '燒', '咖喱', '豆腐']
+LOCATIONS = ['Central', 'Mong Kok', 'Sha Tin', 'Tsuen Wan', 'Causeway Bay', 'Tsim Sha Tsui']
+TABLE_SIZES = {2: 3, 4: 4, 6: 1, 8: 1, 12: 1}
+POINTS = {1: 1, 2: 1, 3: 2, 4: 3, 5: 2}
+
+
+class BulkWriter:
+    # Plain executemany of pre-built tuples: no model instances and no
+    # per-row SQL compilation, which is where bulk_create spends its time.
+
+    def __init__(self, model, fields):
+        self.model = model
+        columns = ', '.join(connection.ops.quote_name(model._meta.get_field(field).column) for field in fields)
+        placeholders = ', '.join(['%s']*len(fields))
+        self.sql = f'INSERT INTO {connection.ops.quote_name(model._meta.db_table)} ({columns}) VALUES ({placeholders})'
+        self.count = 0
+
+    def write(self, rows):
+        if rows:
+            with connection.cursor() as cursor:
+                cursor.executemany(self.sql, rows)
+            self.count += len(rows)
+
+
+def next_id(model):
+    last = model.objects.order_by('-id').values_list('id', flat=True).first()
+    return (last or 0)+1
+
+
+def money(cents):
+    return f'{cents//100}.{cents%100:02d}'
+
+
+def weighted(weights):
+    values = list(weights)
+    return values, list(accumulate(weights[value] for value in values))
+
+
+@contextmanager
+def fast_sqlite(models):
+    # Bulk loading only: skip fsync, keep more pages in memory and drop the
+    # secondary indexes of the big tables, rebuilding each once at the end
+    # (a sorted build is far cheaper than one B-tree insert per row). Inside
+    # an outer transaction the pragmas are refused, so load normally.
+    if connection.vendor != 'sqlite' or connection.in_atomic_block:
+        yield
+        return
+    tables = [model._meta.db_table for model in models]
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA synchronous')
+        synchronous = cursor.fetchone()[0]
+        cursor.execute('PRAGMA synchronous=OFF')
+        cursor.execute('PRAGMA cache_size=-262144')
+        cursor.execute('PRAGMA temp_store=MEMORY')
+        cursor.execute(
+            f"SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL AND tbl_name IN ({', '.join(['%s']*len(tables))})",
+            tables
+        )
+        indexes = cursor.fetchall()
+        for name, _ in indexes:
+            cursor.execute(f'DROP INDEX {connection.ops.quote_name(name)}')
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            for _, sql in indexes:
+                cursor.execute(sql)
+            cursor.execute(f'PRAGMA synchronous={int(synchronous)}')
+
+
+def generate(restaurants, tables, types, foods, users, orders, comments, seed=0, batch_size=20000,
+             unavailable=0.02, table_sizes=TABLE_SIZES, points=POINTS, lines_per_order=(1, 6),
+             food_skew=1.0, days=365, search_index=True, progress=None, now=None):
+    # Deterministic for a given seed, starting ids and now (timestamps are
+    # spread over the days before it). Bulk loading skips signals, so
+    # ratings, the search index, the menu version and the table index are
+    # brought up to date here instead.
+    rng = random.Random(seed)
+    now = now or timezone.now()
+    sqlite = connection.vendor == 'sqlite'
+
+    # SQLite stores naive UTC text, other backends take aware datetimes.
+    timestamp = (lambda value: str(value.astimezone(dt_timezone.utc).replace(tzinfo=None))) if sqlite else (lambda value: value)
+    base = now-timedelta(days=days)
+    if sqlite:
+        base = base.astimezone(dt_timezone.utc).replace(tzinfo=None)
+    span = days*86400
+
+    def timestamps(k):
+        if sqlite:
+            return [str(base+timedelta(seconds=rng.random()*span)) for _ in range(k)]
+        return [base+timedelta(seconds=rng.random()*span) for _ in range(k)]
+
+    def report(model, writer):
+        if progress:
+            progress(model, writer.count)
+
+    def batches(total):
+        for start in range(0, total, batch_size):
+            yield start, min(batch_size, total-start)
+
+    r0, t0, y0, f0 = next_id(Restaurant), next_id(Table), next_id(Type), next_id(Food)
+    u0, o0, l0, c0, n0 = next_id(User), next_id(Order), next_id(OrderLine), next_id(Comment), next_id(Unavailable)
+    restaurant_ids = list(range(r0, r0+restaurants))
+    food_ids = list(range(f0, f0+foods))
+    user_ids = list(range(u0, u0+users))
+    table_ids = list(range(t0, t0+restaurants*tables))
+    food_cents = [rng.randrange(1000, 30000) for _ in range(foods)]
+    # Popularity falls off as 1/rank**food_skew; 0 gives a uniform menu.
+    food_weights = list(accumulate(1/(rank+1)**food_skew for rank in range(foods)))
+    sizes, size_weights = weighted(table_sizes)
+    point_values, point_weights = weighted(points)
+    stamp = timestamp(now)
+    random_ = rng.random
+
+    with fast_sqlite([Order, OrderLine, Comment]):
+        writer = BulkWriter(Restaurant, ['id', 'name', 'location'])
+        with transaction.atomic():
+            writer.write([(r0+i, f'Restaurant {r0+i}', rng.choice(LOCATIONS)) for i in range(restaurants)])
+        report(Restaurant, writer)
+
+        writer = BulkWriter(Table, ['id', 'max_no', 'available', 'restaurant_id'])
+        with transaction.atomic():
+            picked = rng.choices(sizes, cum_weights=size_weights, k=len(table_ids))
+            writer.write([(table_id, size, True, restaurant_ids[i//tables]) for i, (table_id, size) in enumerate(zip(table_ids, picked))])
+        report(Table, writer)
+
+        writer = BulkWriter(Type, ['id', 'chinese_name', 'english_name'])
+        type_rows = [(y0+i, CJK[i % len(CJK)]+str(y0+i), f'{WORDS[i % len(WORDS)]} {y0+i}') for i in range(types)]
+        with transaction.atomic():
+            writer.write(type_rows)
+        report(Type, writer)
+
+        writer = BulkWriter(Food, ['id', 'chinese_name', 'english_name', 'price', 'description', 'ave_point', 'type_id', 'no_of_comment', 'point_sum'])
+        food_documents = []
+        for start, size in batches(foods):
+            rows = []
+            for i in range(start, start+size):
+                a, b = rng.randrange(len(WORDS)), rng.randrange(len(WORDS))
+                rows.append((f0+i, CJK[a]+CJK[b], f'{WORDS[a]} {WORDS[b]} {f0+i}', money(food_cents[i]), '', 0, y0+rng.randrange(types), 0, 0))
+            with transaction.atomic():
+                writer.write(rows)
+            if search_index:
+                food_documents += [(row[0], f'{row[1]} {row[2]}') for row in rows]
+        report(Food, writer)
+
+        writer = BulkWriter(Unavailable, ['id', 'food_id', 'restaurant_id'])
+        with transaction.atomic():
+            rows = []
+            for restaurant_id in restaurant_ids:
+                for food_id in rng.sample(food_ids, round(foods*unavailable)):
+                    rows.append((n0+len(rows), food_id, restaurant_id))
+            writer.write(rows)
+        report(Unavailable, writer)
+
+        writer = BulkWriter(User, ['id', 'password', 'last_login', 'is_superuser', 'username', 'first_name', 'last_name', 'email', 'is_staff', 'is_active', 'date_joined'])
+        password = make_password(None)
+        for start, size in batches(users):
+            with transaction.atomic():
+                writer.write([(u0+i, password, None, False, f'diner{u0+i}', '', '', '', False, True, stamp) for i in range(start, start+size)])
+        report(User, writer)
+
+        order_writer = BulkWriter(Order, ['id', 'user_id', 'table_id', 'no_of_people', 'complete', 'total_price', 'created_at', 'updated_at'])
+        line_writer = BulkWriter(OrderLine, ['id', 'order_id', 'food_id', 'number', 'price', 'created_at'])
+        low, high = lines_per_order
+        line_id = l0
+        for start, size in batches(orders):
+            order_rows, line_rows = [], []
+            counts = [low+int(random_()*(high-low+1)) for _ in range(size)]
+            picked_foods = iter(rng.choices(range(foods), cum_weights=food_weights, k=sum(counts)))
+            for order_id, count, created_at in zip(range(o0+start, o0+start+size), counts, timestamps(size)):
+                total = 0
+                for _ in range(count):
+                    food = next(picked_foods)
+                    number = 1+int(random_()*3)
+                    cents = food_cents[food]*number
+                    total += cents
+                    line_rows.append((line_id, order_id, f0+food, number, money(cents), created_at))
+                    line_id += 1
+                order_rows.append((order_id, u0+int(random_()*users), t0+int(random_()*len(table_ids)), 1+int(random_()*4), True, money(total), created_at, created_at))
+            with transaction.atomic():
+                order_writer.write(order_rows)
+                line_writer.write(line_rows)
+        report(Order, order_writer)
+        report(OrderLine, line_writer)
+
+        writer = BulkWriter(Comment, ['id', 'user_id', 'restaurant_id', 'food_id', 'comment', 'give_point', 'created_at', 'updated_at'])
+        point_sum, no_of_comment = defaultdict(int), defaultdict(int)
+        vocabulary = WORDS+CJK
+        # A fixed pool of texts keeps generation and tokenizing cheap.
+        texts = [' '.join(rng.choices(vocabulary, k=3+int(random_()*10))) for _ in range(min(comments, 5000))]
+        comment_documents = []
+        for start, size in batches(comments):
+            rows = []
+            picked_foods = rng.choices(food_ids, cum_weights=food_weights, k=size)
+            picked_points = rng.choices(point_values, cum_weights=point_weights, k=size)
+            for i, food_id, point, created_at in zip(range(c0+start, c0+start+size), picked_foods, picked_points, timestamps(size)):
+                rows.append((i, u0+int(random_()*users), r0+int(random_()*restaurants), food_id, texts[int(random_()*len(texts))], point, created_at, created_at))
+                point_sum[food_id] += point
+                no_of_comment[food_id] += 1
+            with transaction.atomic():
+                writer.write(rows)
+            if search_index:
+                comment_documents += [(row[0], row[4]) for row in rows]
+        report(Comment, writer)
+
+        # Ratings are known exactly from what was generated (the foods are
+        # new, so these are their totals): one executemany.
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(
+                f'UPDATE {Food._meta.db_table} SET point_sum = %s, no_of_comment = %s, ave_point = %s WHERE id = %s',
+                [(point_sum[food_id], no_of_comment[food_id], str(average(point_sum[food_id], no_of_comment[food_id])), food_id) for food_id in no_of_comment]
+            )
+
+        if search_index:
+            backend = get_search_backend()
+            with transaction.atomic():
+                backend.index_documents('type', [(row[0], f'{row[1]} {row[2]}') for row in type_rows])
+                backend.index_documents('food', food_documents)
+                backend.index_documents('comment', comment_documents)
+
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [Restaurant, Table, Type, Food, Unavailable, User, Order, OrderLine, Comment]):
+                cursor.execute(sql)
+
+    table_index.clear()
+    MenuSnapshot.objects.all().delete()
+    bump_menu_version()
+    bump_availability_version()
+    return {
+        'restaurant_ids': restaurant_ids,
+        'food_ids': food_ids,
+        'user_ids': user_ids,
+    }
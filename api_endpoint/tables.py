@@ -0,0 +1,64 @@
+import threading
+from bisect import bisect_left, insort
+
+from .models import *
+
+
+class TableIndex:
+    # Free tables per restaurant as a sorted list of (max_no, table_id), so the
+    # smallest table that fits a party is one bisect away. Loaded lazily per
+    # restaurant and reloaded when it misses, since tables freed by other
+    # processes or queryset updates never reach it; the conditional UPDATE
+    # in book_table stays the source of truth.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._free = {}
+
+    def _load(self, restaurant_id):
+        if restaurant_id not in self._free:
+            self._free[restaurant_id] = sorted(
+                Table.objects.filter(restaurant_id=restaurant_id, available=True).values_list('max_no', 'id')
+            )
+        return self._free[restaurant_id]
+
+    def reload(self, restaurant_id):
+        with self._lock:
+            self._free.pop(restaurant_id, None)
+            self._load(restaurant_id)
+
+    def best_fit(self, restaurant_id, no_of_people):
+        with self._lock:
+            free = self._load(restaurant_id)
+            i = bisect_left(free, (no_of_people, 0))
+            if i == len(free):
+                return None
+            return free[i][1]
+
+    def add(self, table):
+        with self._lock:
+            free = self._free.get(table.restaurant_id)
+            if free is not None and (table.max_no, table.id) not in free:
+                insort(free, (table.max_no, table.id))
+
+    def discard(self, table):
+        with self._lock:
+            free = self._free.get(table.restaurant_id)
+            if free is None:
+                return
+            i = bisect_left(free, (table.max_no, table.id))
+            if i < len(free) and free[i] == (table.max_no, table.id):
+                del free[i]
+
+    def remove_id(self, table_id):
+        # Slow path for admin edits, where the old restaurant/max_no are unknown.
+        with self._lock:
+            for free in self._free.values():
+                free[:] = [entry for entry in free if entry[1] != table_id]
+
+    def clear(self):
+        with self._lock:
+            self._free.clear()
+
+
+table_index = TableIndex()
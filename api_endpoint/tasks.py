@@ -0,0 +1,159 @@
+import logging
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils.module_loading import import_string
+
+from .models import *
+
+# Background tasks for side effects that need not finish before the
+# response (rating aggregates, order completion). A task is a Task row,
+# enqueued in the transaction of the change that needs it, so it exists
+# exactly when the change committed. TASK_WORKERS threads of the web
+# process run them, or `manage.py run_tasks` does. A task's function runs
+# in one transaction with marking it done, so its database writes apply
+# once; failures are retried with exponential backoff.
+
+logger = logging.getLogger(__name__)
+
+
+class LeaseLost(Exception):
+    pass
+
+
+def task_name(func):
+    return f'{func.__module__}.{func.__qualname__}'
+
+
+def enqueue(func, args=(), key=None, delay=0, max_attempts=None):
+    # func must be importable by its dotted path and args JSON-serializable
+    # (Decimals arrive as strings). With a key, the task is enqueued once
+    # however often this runs, for as long as TASK_RETENTION keeps it.
+    Task.objects.bulk_create([Task(
+        name=task_name(func),
+        args=list(args),
+        key=key,
+        run_at=timezone.now()+timedelta(seconds=delay),
+        max_attempts=max_attempts or getattr(settings, 'TASK_MAX_ATTEMPTS', 5),
+    )], ignore_conflicts=True)
+    transaction.on_commit(task_pool.wake)
+
+
+def due_tasks(now):
+    # Running tasks whose lease ran out belong to a worker that died.
+    return Task.objects.filter(
+        Q(status=Task.PENDING) | Q(status=Task.RUNNING, attempts__lt=F('max_attempts')),
+        run_at__lte=now,
+    )
+
+
+def claim():
+    now = timezone.now()
+    lease = timedelta(seconds=getattr(settings, 'TASK_LEASE_SECONDS', 60))
+    for task_id in due_tasks(now).order_by('run_at', 'id').values_list('id', flat=True)[:10]:
+        # Like a table booking, the conditional UPDATE is the claim.
+        if due_tasks(now).filter(id=task_id).update(status=Task.RUNNING, run_at=now+lease, attempts=F('attempts')+1, updated_at=now):
+            return Task.objects.get(id=task_id)
+    return None
+
+
+def run_task(task):
+    # True when the task is done, False when it failed or another worker
+    # took it over.
+    try:
+        with transaction.atomic():
+            import_string(task.name)(*task.args)
+            # Marking it done fails once the lease ran out and another
+            # worker claimed it; this run's writes are rolled back.
+            finished = Task.objects.filter(id=task.id, status=Task.RUNNING, attempts=task.attempts)
+            if not finished.update(status=Task.DONE, last_error='', updated_at=timezone.now()):
+                raise LeaseLost()
+    except LeaseLost:
+        logger.warning('Task %s (%s) lost its lease.', task.id, task.name)
+        return False
+    except Exception:
+        logger.exception('Task %s (%s) failed on attempt %s.', task.id, task.name, task.attempts)
+        retry = task.attempts < task.max_attempts
+        delay = min(getattr(settings, 'TASK_RETRY_DELAY', 5)*2**(task.attempts-1), 60*60)
+        Task.objects.filter(id=task.id, status=Task.RUNNING, attempts=task.attempts).update(
+            status=Task.PENDING if retry else Task.FAILED,
+            run_at=timezone.now()+timedelta(seconds=delay),
+            last_error=traceback.format_exc(),
+            updated_at=timezone.now(),
+        )
+        return False
+    return True
+
+
+def run_pending(limit=None):
+    # Runs due tasks in this thread until none is left; returns how many ran.
+    count = 0
+    while limit is None or count < limit:
+        task = claim()
+        if task is None:
+            break
+        run_task(task)
+        count += 1
+    return count
+
+
+def purge_tasks():
+    now = timezone.now()
+    Task.objects.filter(status=Task.RUNNING, run_at__lte=now, attempts__gte=F('max_attempts')).update(
+        status=Task.FAILED, last_error='The lease of the last attempt ran out.', updated_at=now,
+    )
+    retention = timedelta(seconds=getattr(settings, 'TASK_RETENTION', 7*24*60*60))
+    return Task.objects.filter(status=Task.DONE, updated_at__lte=now-retention).delete()[0]
+
+
+def retry_failed():
+    return Task.objects.filter(status=Task.FAILED).update(status=Task.PENDING, attempts=0, run_at=timezone.now(), updated_at=timezone.now())
+
+
+class TaskPool:
+    # Worker threads of this process. A committed enqueue wakes them, so a
+    # task usually starts at once; otherwise they poll every
+    # TASK_POLL_SECONDS for retries and tasks enqueued by other processes.
+    PURGE_INTERVAL = 60*60
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._threads = []
+        self._next_purge = 0
+
+    def start(self, workers=None):
+        workers = getattr(settings, 'TASK_WORKERS', 2) if workers is None else workers
+        with self._lock:
+            while len(self._threads) < workers:
+                thread = threading.Thread(target=self._work, name=f'task-worker-{len(self._threads)+1}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            return list(self._threads)
+
+    def wake(self):
+        self._wake.set()
+
+    def _work(self):
+        while True:
+            self._wake.clear()
+            close_old_connections()
+            try:
+                with self._lock:
+                    purge = time.monotonic() >= self._next_purge
+                    if purge:
+                        self._next_purge = time.monotonic()+self.PURGE_INTERVAL
+                if purge:
+                    purge_tasks()
+                run_pending()
+            except Exception:
+                logger.exception('Task worker could not read the queue.')
+            self._wake.wait(getattr(settings, 'TASK_POLL_SECONDS', 1))
+
+
+task_pool = TaskPool()
@@ -1,13 +1,15 @@
 from django.urls import path
 
-from . import views
+from . import async_views, views
 
 urlpatterns = [
     path('restaurant', views.RestaurantView.as_view()),
     path('restaurant/<int:pk>', views.SingleRestaurantView.as_view()),
+    path('restaurant/<int:pk>/menu', views.MenuView.as_view()),
 
     path('table', views.TableView.as_view()),
     path('table/<int:pk>', views.SingleTableView.as_view()),
+    path('table/allocate', views.TableAllocateView.as_view()),
 
     path('type', views.TypeView.as_view()),
     path('type/<int:pk>', views.SingleTypeView.as_view()),
@@ -19,10 +21,24 @@ urlpatterns = [
     path('order/<int:pk>', views.SingleOrderView.as_view()),
 
     path('order-food', views.OrderFoodView.as_view()),
+    path('order-food/bulk', views.OrderFoodBulkView.as_view()),
 
     path('comment', views.CommentView.as_view()),
     path('comment/<int:pk>', views.SingleCommentView.as_view()),
 
+    path('search', views.SearchView.as_view()),
+
+    path('profiling', views.ProfilingView.as_view()),
+
     path('unavailable', views.UnavailableView.as_view()),
     path('unavailable/<int:pk>', views.SingleUnavailableView.as_view()),
+
+    path('async/restaurant', async_views.AsyncRestaurantView.as_view()),
+    path('async/table', async_views.AsyncTableView.as_view()),
+    path('async/type', async_views.AsyncTypeView.as_view()),
+    path('async/food', async_views.AsyncFoodView.as_view()),
+    path('async/comment', async_views.AsyncCommentView.as_view()),
+    path('async/order/<int:pk>', async_views.AsyncSingleOrderView.as_view()),
+
+    path('events', async_views.EventStreamView.as_view()),
 ]
\ No newline at end of file
@@ -4,26 +4,41 @@ from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from django.contrib.auth.models import User, Group
 from rest_framework import status
 from rest_framework.response import Response
+from django.db import transaction
 from django.db.models import Q
+from decimal import Decimal, InvalidOperation
 
 from .models import *
 from .serializers import *
+from .pagination import KeysetPagination, FoodPagination
+from .cache import HTTPCacheMixin, cached_menu_response
+from .filters import FilterError, RestaurantFilters, TableFilters, TypeFilters, FoodFilters, CommentFilters
+from .availability import availability_index
+from .ratings import enqueue_rating
+from .search import SEARCH_FIELDS, get_search_backend
+from .profiling import profile_store, report
+from .menus import menu_snapshot
+from .authentication import token_cache
+from .orders import BookingError, money, order_queryset, get_ordered_food_detail, add_order_line, add_order_lines, remove_order_line, book_table, allocate_table, complete_order
 
 # Create your views here.
 
-class RestaurantView(generics.ListCreateAPIView):
+class RestaurantView(HTTPCacheMixin, generics.ListCreateAPIView):
     serializer_class = RestaurantSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        queryset = Restaurant.objects.all()
-        name_query = self.request.data.get('name', None)
-        location_query = self.request.data.get('location', None)
-        if name_query:
-            queryset = queryset.filter(name__icontains=name_query)
-        if location_query:
-            queryset = queryset.filter(location__icontains=location_query)
-        return queryset
+        return RestaurantSerializer.setup_eager_loading(Restaurant.objects.all())
+
+    def list(self, request, *args, **kwargs):
+        try:
+            self.filters = RestaurantFilters.from_request(request)
+        except FilterError as e:
+            return Response({'error': e.message}, status=status.HTTP_400_BAD_REQUEST)
+        return super().list(request, *args, **kwargs)
+
+    def filter_queryset(self, queryset):
+        return self.filters.apply(queryset)
 
     def create(self, request, *args, **kwargs):
         if not request.user.is_superuser:
@@ -31,7 +46,7 @@ class RestaurantView(generics.ListCreateAPIView):
         return super().create(request, *args, **kwargs)
 
 class SingleRestaurantView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Restaurant.objects.all()
+    queryset = RestaurantSerializer.setup_eager_loading(Restaurant.objects.all())
     serializer_class = RestaurantSerializer
     permission_classes = [IsAuthenticated]
 
@@ -45,30 +60,28 @@ class SingleRestaurantView(generics.RetrieveUpdateDestroyAPIView):
             return Response({'error': 'Only superuser can delete restaurants.'}, status=status.HTTP_403_FORBIDDEN)
         return super().delete(request, *args, **kwargs)
 
+class MenuView(HTTPCacheMixin, APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        return cached_menu_response(request, f'snapshot:{pk}', lambda: self.build(pk))
+
+    def build(self, pk):
+        data = menu_snapshot(pk)
+        if data is None:
+            return Response({'error': f'Restaurant with id {pk} does not exist.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(data, status=status.HTTP_200_OK)
+
 class TableView(generics.ListCreateAPIView):
     serializer_class = TableSerializer
     permission_classes = [IsAuthenticated]
 
     def list(self, request):
-        max_no_query = request.data.get('max_no', None)
-        restaurant_query = request.data.get('restaurant_id', None)
-        location_query = request.data.get('location', None)
-        available = request.data.get('available', True)
-        queryset = Table.objects.filter(available=available)
-        if max_no_query:
-            try:
-                max_no = int(max_no_query)
-            except ValueError:
-                return Response({'error': 'max_no must be int.'}, status=status.HTTP_400_BAD_REQUEST)
-            queryset = queryset.filter(max_no__gte=max_no)
-        if restaurant_query:
-            try:
-                restaurant_id = int(restaurant_query)
-            except ValueError:
-                return Response({'error': 'restaurant id must be int.'}, status=status.HTTP_400_BAD_REQUEST)
-            queryset = queryset.filter(restaurant_id=restaurant_id)
-        if location_query:
-            queryset = queryset.filter(restaurant__location__icontains=location_query)
+        try:
+            filters = TableFilters.from_request(request)
+        except FilterError as e:
+            return Response({'error': e.message}, status=status.HTTP_400_BAD_REQUEST)
+        queryset = filters.apply(TableSerializer.setup_eager_loading(Table.objects.all()))
         return Response({'table': TableSerializer(queryset, many=True).data}, status=status.HTTP_200_OK)
 
     def create(self, request, *args, **kwargs):
@@ -98,8 +111,27 @@ class TableView(generics.ListCreateAPIView):
         )
         return Response({'table': TableSerializer(table).data, 'message': 'success'}, status=status.HTTP_201_CREATED)
 
+class TableAllocateView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        restaurant_id = request.data.get('restaurant_id', None)
+        no_of_people = request.data.get('no_of_people', 1)
+        if not restaurant_id:
+            return Response({'error': 'restaurant id is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            restaurant_id = int(restaurant_id)
+            no_of_people = int(no_of_people)
+        except ValueError:
+            return Response({'error': 'restaurant id and no_of_people must be int.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            order = allocate_table(request.user, restaurant_id, no_of_people)
+        except BookingError as e:
+            return Response({'error': e.message}, status=e.status_code)
+        return Response({'order': OrderSerializer(order).data}, status=status.HTTP_201_CREATED)
+
 class SingleTableView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Table.objects.all()
+    queryset = TableSerializer.setup_eager_loading(Table.objects.all())
     serializer_class = TableSerializer
     permission_classes = [IsAuthenticated]
 
@@ -113,16 +145,22 @@ class SingleTableView(generics.RetrieveUpdateDestroyAPIView):
             return Response({'error': 'Only superuser can delete restaurants.'}, status=status.HTTP_403_FORBIDDEN)
         return super().delete(request, *args, **kwargs)
 
-class TypeView(generics.ListCreateAPIView):
+class TypeView(HTTPCacheMixin, generics.ListCreateAPIView):
     serializer_class = TypeSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        queryset = Type.objects.all()
-        search_query = self.request.data.get('search', None)
-        if search_query:
-            queryset = queryset.filter(Q(chinese_name__icontains=search_query)|Q(english_name__icontains=search_query))
-        return queryset
+        return TypeSerializer.setup_eager_loading(Type.objects.all())
+
+    def list(self, request, *args, **kwargs):
+        try:
+            self.filters = TypeFilters.from_request(request)
+        except FilterError as e:
+            return Response({'error': e.message}, status=status.HTTP_400_BAD_REQUEST)
+        return cached_menu_response(request, 'type', lambda: super(TypeView, self).list(request, *args, **kwargs))
+
+    def filter_queryset(self, queryset):
+        return self.filters.apply(queryset)
 
     def create(self, request, *args, **kwargs):
         if not request.user.is_superuser:
@@ -130,7 +168,7 @@ class TypeView(generics.ListCreateAPIView):
         return super().create(request, *args, **kwargs)
 
 class SingleTypeView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Type.objects.all()
+    queryset = TypeSerializer.setup_eager_loading(Type.objects.all())
     serializer_class = TypeSerializer
     permission_classes = [IsAuthenticated]
     
@@ -144,51 +182,32 @@ class SingleTypeView(generics.RetrieveUpdateDestroyAPIView):
             return Response({'error': 'Only superuser can delete types.'}, status=status.HTTP_403_FORBIDDEN)
         return super().delete(request, *args, **kwargs)
 
-class FoodView(generics.ListCreateAPIView):
+class FoodView(HTTPCacheMixin, generics.ListCreateAPIView):
     serializer_class = FoodSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = FoodPagination
+    # Read path for list(); None falls back to serializer_class.
+    values_serializer = food_rows
 
     def list(self, request):
-        queryset = Food.objects.all()
-        name_query = request.data.get('name', None)
-        price_lte = request.data.get('price_lte', None)
-        price_gte = request.data.get('price_gte', None)
-        point_lte = request.data.get('point_lte', None)
-        point_gte = request.data.get('point_gte', None)
-        type_id = request.data.get('type_id', None)
-        if name_query:
-            queryset = queryset.filter(Q(chinese_name__icontains=name_query)|Q(english_name__icontains=name_query))
-        if price_gte:
-            try:
-                price_gte = float(price_gte)
-            except ValueError:
-                return Response({'error': 'price must be float'}, status=status.HTTP_400_BAD_REQUEST)
-            queryset = queryset.filter(price__gte=price_gte)
-        if price_lte:
-            try:
-                price_lte = float(price_lte)
-            except ValueError:
-                return Response({'error': 'price must be float'}, status=status.HTTP_400_BAD_REQUEST)
-            queryset = queryset.filter(price__lte=price_lte)
-        if point_gte:
-            try:
-                point_gte = float(point_gte)
-            except ValueError:
-                return Response({'error': 'point must be float'}, status=status.HTTP_400_BAD_REQUEST)
-            queryset = queryset.filter(ave_point__gte=point_gte)
-        if point_lte:
-            try:
-                point_lte = float(point_lte)
-            except ValueError:
-                return Response({'error': 'point must be float'}, status=status.HTTP_400_BAD_REQUEST)
-            queryset = queryset.filter(ave_point__gte=point_lte)
-        if type_id:
-            try:
-                type_id = int(type_id)
-            except ValueError:
-                return Response({'error': 'type id must be int'}, status=status.HTTP_400_BAD_REQUEST)
-            queryset = queryset.filter(type_id=type_id)
-        return Response({'food': FoodSerializer(queryset, many=True).data}, status=status.HTTP_200_OK)
+        return cached_menu_response(request, 'food', lambda: self.build_list(request))
+
+    def build_list(self, request):
+        try:
+            filters = FoodFilters.from_request(request)
+        except FilterError as e:
+            return Response({'error': e.message}, status=status.HTTP_400_BAD_REQUEST)
+        queryset = filters.apply(FoodSerializer.setup_eager_loading(Food.objects.all()))
+        restaurant_id = filters.restaurant_id
+        if self.values_serializer:
+            data = self.values_serializer.to_representation(self.paginate_queryset(self.values_serializer.values(queryset)))
+        else:
+            data = FoodSerializer(self.paginate_queryset(queryset), many=True).data
+        if restaurant_id:
+            available = availability_index.available_foods(restaurant_id, [food['id'] for food in data])
+            for food in data:
+                food['available'] = food['id'] in available
+        return Response(self.paginator.get_paginated_data('food', data), status=status.HTTP_200_OK)
 
     def create(self, request, *args, **kwargs):
         if not request.user.is_superuser:
@@ -196,7 +215,7 @@ class FoodView(generics.ListCreateAPIView):
         
 
 class SingleFoodView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Food.objects.all()
+    queryset = FoodSerializer.setup_eager_loading(Food.objects.all())
     serializer_class = FoodSerializer
     permission_classes = [IsAuthenticated]
     
@@ -211,58 +230,44 @@ class SingleFoodView(generics.RetrieveUpdateDestroyAPIView):
         return super().delete(request, *args, **kwargs)
 
 class OrderView(generics.ListCreateAPIView):
-    queryset = Order.objects.all()
+    queryset = order_queryset()
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def list(self, request, *args, **kwargs):
         if not request.user.is_superuser:
             return Response({'error': 'Only superuser can view all orders.'}, status=status.HTTP_403_FORBIDDEN)
-        return super().list(request, *args, **kwargs)
+        data = OrderSerializer(self.paginate_queryset(self.get_queryset()), many=True).data
+        return Response(self.paginator.get_paginated_data('order', data), status=status.HTTP_200_OK)
 
     def post(self, request, *args, **kwargs):
-        table, no_of_people = request.data.get('table_id', None), int(request.data.get('no_of_people', 1))
-        if not table:
+        table_id = request.data.get('table_id', None)
+        if not table_id:
             return Response({'error': 'Table id miss'}, status=status.HTTP_400_BAD_REQUEST)
         try:
-            table = Table.objects.get(id=int(table))
-            if no_of_people > table.max_no:
-                return Response({'error': f'The max. load of this table ({table.max_no}) is smaller than {no_of_people}.'}, status=status.HTTP_404_NOT_FOUND)
-            if not table.available:
-                return Response({'error': f'This table is not available now. Please choice other table.'}, status=status.HTTP_403_FORBIDDEN)
-            table.available = False
-            table.save()
-        except Table.DoesNotExist:
-            return Response({'error': 'Table id does not exist'}, status=status.HTTP_404_NOT_FOUND)
-        order = Order.objects.create(
-            user=request.user,
-            table=table,
-            no_of_people=no_of_people,
-        )
+            table_id = int(table_id)
+            no_of_people = int(request.data.get('no_of_people', 1))
+        except ValueError:
+            return Response({'error': 'Table id and no_of_people must be int.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            order = book_table(request.user, table_id, no_of_people)
+        except BookingError as e:
+            return Response({'error': e.message}, status=e.status_code)
         return Response({'order': OrderSerializer(order).data}, status=status.HTTP_201_CREATED)
 
 class SingleOrderView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Order.objects.all()
+    queryset = order_queryset()
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
 
     def get(self, request, *args, **kwargs):
         order = self.get_object()
-        if request.user != order.user and not request.user.is_superuser:
+        if order.user_id != request.user.id and not request.user.is_superuser:
             return Response({'error': 'Only superuser can view orders.'}, status=status.HTTP_403_FORBIDDEN)
-        ordered_food = []
-        for food in order.get_ordered_food().values():
-            food_infor = Food.objects.get(id=food['id'])
-            ordered_food.append(
-                {
-                    'chinese_name': food_infor.chinese_name,
-                    'english_name': food_infor.english_name,
-                    'number': food['number']
-                }
-            )
         data = {
             'order': OrderSerializer(order).data,
-            'ordered_food': ordered_food
+            'ordered_food': get_ordered_food_detail(order)
         }
         return Response(data, status=status.HTTP_200_OK)
 
@@ -278,8 +283,9 @@ class SingleOrderView(generics.RetrieveUpdateDestroyAPIView):
         if not complete:
             return Response({'message': 'Order still lives.'}, status=status.HTTP_200_OK)
         order = self.get_object()
-        order.complete = True
-        order.save()
+        if order.complete:
+            return Response({'error': 'This order has been completed.'}, status=status.HTTP_400_BAD_REQUEST)
+        order = complete_order(order)
         return Response({'message': f'Order is completed. Total price is ${order.total_price}', 'order': OrderSerializer(order).data}, status=status.HTTP_200_OK)
 
 class OrderFoodView(APIView):
@@ -294,16 +300,18 @@ class OrderFoodView(APIView):
             number = int(number)
         except ValueError:
             return Response({'error': f'Number must be int.'}, status=status.HTTP_400_BAD_REQUEST)
+        if number < 1:
+            return Response({'error': 'Number must be positive.'}, status=status.HTTP_400_BAD_REQUEST)
         
         if not order_id:
             return Response({'error': 'Order id miss.'}, status=status.HTTP_400_BAD_REQUEST)
         try:
-            order = Order.objects.get(id=int(order_id))
+            order = order_queryset().get(id=int(order_id))
         except Order.DoesNotExist:
             return Response({'error': 'Order does not exist.'}, status=status.HTTP_404_NOT_FOUND)
         except ValueError:
             return Response({'error': f'Order id must be int.'}, status=status.HTTP_400_BAD_REQUEST)
-        if order.user != request.user:
+        if order.user_id != request.user.id:
             return Response({'error': 'This order is not yours.'}, status=status.HTTP_403_FORBIDDEN)
         if order.complete:
             return Response({'error': 'This order has been paid. Please create a new order.'}, status=status.HTTP_400_BAD_REQUEST)
@@ -317,24 +325,11 @@ class OrderFoodView(APIView):
         except ValueError:
             return Response({'error': f'Food id must be int.'}, status=status.HTTP_400_BAD_REQUEST)
         
-        if Unavailable.objects.filter(food=food, restaurant=order.table.restaurant).exists():
+        if order.table_id and not availability_index.is_available(order.table.restaurant_id, food.id):
             return Response({'error': f'Sorry, {food.chinese_name}/{food.english_name} is not available in {order.table.restaurant.name} now.'}, status=status.HTTP_404_NOT_FOUND)
         
-        ordered_food = order.get_ordered_food()
-        if len(ordered_food) == 0:
-            no_ordered_food = 0
-        else:
-            no_ordered_food = max(ordered_food)+1
-        ordered_food[no_ordered_food] = {
-            'id': food.id,
-            'number': number,
-            'price': float(food.price*number)
-        }
-        print(ordered_food)
-        order.set_ordered_dict(ordered_food)
-        order.total_price += food.price*number
-        order.save()
-        return Response({'message': 'success', 'ordered_food': FoodSerializer(food).data, 'number': number}, status=status.HTTP_202_ACCEPTED)
+        line = add_order_line(order, food, number)
+        return Response({'message': 'success', 'ordered_food': FoodSerializer(food).data, 'number': number, 'order_no': line.id}, status=status.HTTP_202_ACCEPTED)
     
     def delete(self, request):
         order_no = request.data.get('order_no', None)
@@ -349,63 +344,95 @@ class OrderFoodView(APIView):
         if not order_id:
             return Response({'error': 'Order id miss.'}, status=status.HTTP_400_BAD_REQUEST)
         try:
-            order = Order.objects.get(id=int(order_id))
+            order = order_queryset().get(id=int(order_id))
         except Order.DoesNotExist:
             return Response({'error': 'Order does not exist.'}, status=status.HTTP_404_NOT_FOUND)
         except ValueError:
             return Response({'error': f'Order id must be int.'}, status=status.HTTP_400_BAD_REQUEST)
-        if order.user != request.user:
+        if order.user_id != request.user.id:
             return Response({'error': 'This order is not yours.'}, status=status.HTTP_403_FORBIDDEN)
         if order.complete:
             return Response({'error': 'This order has been paid. Please create a new order.'}, status=status.HTTP_400_BAD_REQUEST)
         
-        ordered_food = order.get_ordered_food()
-        deleted_ordered_food = ordered_food.pop(order_no)
-        order.set_ordered_dict(ordered_food)
-        order.total_price -= deleted_ordered_food['price']
+        if remove_order_line(order, order_no) is None:
+            return Response({'error': f'Order no {order_no} does not exist.'}, status=status.HTTP_404_NOT_FOUND)
+        order.refresh_from_db()
+        return Response({'message': 'success', 'order': OrderSerializer(order).data}, status=status.HTTP_202_ACCEPTED)
+
+class OrderFoodBulkView(APIView):
+    permission_classes = []
+
+    def post(self, request):
+        order_id = request.data.get('order_id', None)
+        items = request.data.get('items', None)
+        if not order_id:
+            return Response({'error': 'Order id miss.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(items, list) or not items:
+            return Response({'error': 'items must be a list of {food_id, number}.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            order = order_queryset().get(id=int(order_id))
+        except Order.DoesNotExist:
+            return Response({'error': 'Order does not exist.'}, status=status.HTTP_404_NOT_FOUND)
+        except ValueError:
+            return Response({'error': f'Order id must be int.'}, status=status.HTTP_400_BAD_REQUEST)
+        if order.user_id != request.user.id:
+            return Response({'error': 'This order is not yours.'}, status=status.HTTP_403_FORBIDDEN)
+        if order.complete:
+            return Response({'error': 'This order has been paid. Please create a new order.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        return Response({'message': 'success', 'order': OrderSerializer(ordered_food).data}, status=status.HTTP_202_ACCEPTED)
+        results, parsed = [], []
+        for item in items:
+            result = {'food_id': item.get('food_id') if isinstance(item, dict) else None}
+            results.append(result)
+            try:
+                food_id, number = int(item['food_id']), int(item.get('number', 1))
+            except (TypeError, KeyError, ValueError, AttributeError):
+                result['error'] = 'food_id and number must be int.'
+                continue
+            if number < 1:
+                result['error'] = 'Number must be positive.'
+                continue
+            parsed.append((result, food_id, number))
+
+        foods = Food.objects.in_bulk({food_id for _, food_id, _ in parsed})
+        available = availability_index.available_foods(order.table.restaurant_id, foods) if order.table_id else set(foods)
+        accepted = []
+        for result, food_id, number in parsed:
+            food = foods.get(food_id)
+            if food is None:
+                result['error'] = f'Food id {food_id} does not exist.'
+            elif food_id not in available:
+                result['error'] = f'Sorry, {food.chinese_name}/{food.english_name} is not available in {order.table.restaurant.name} now.'
+            else:
+                accepted.append((result, food, number))
+
+        lines = add_order_lines(order, [(food, number) for _, food, number in accepted])
+        for (result, food, number), line in zip(accepted, lines):
+            result.update({'order_no': line.id, 'number': number, 'price': money(line.price)})
+        order.refresh_from_db(fields=['total_price', 'updated_at'])
+        return Response({'message': 'success', 'results': results, 'total_price': money(order.total_price)}, status=status.HTTP_202_ACCEPTED)
 
 class CommentView(generics.ListCreateAPIView):
     serializer_class = CommentSerializer
     permission_classes = []
+    pagination_class = KeysetPagination
+    values_serializer = comment_rows
 
     def list(self, request):
-        queryset = Comment.objects.all()
-        food_name = request.data.get('food_name', None)
-        give_point_gte = request.data.get('give_point_gte', None)
-        give_point_lte = request.data.get('give_point_lte', None)
-        user_id = request.data.get('user_id', None)
-        restaurant_id = request.data.get('restaurant_id', None)
-        if food_name:
-            queryset = queryset.filter(Q(food__chinese_name__icontains=food_name)|Q(food__english_name__icontains=food_name))
-        if give_point_gte:
-            try:
-                queryset = queryset.filter(give_point__gte=float(give_point_gte))
-            except ValueError:
-                return Response({'error': 'give_point must be float'}, status=status.HTTP_400_BAD_REQUEST)
-        if give_point_lte:
-            try:
-                queryset = queryset.filter(give_point__lte=float(give_point_lte))
-            except ValueError:
-                return Response({'error': 'give_point must be float'}, status=status.HTTP_400_BAD_REQUEST)
-        if restaurant_id:
-            try:
-                restaurant = Restaurant.objects.get(id=int(restaurant_id))
-            except Restaurant.DoesNotExist:
-                return Response({'error': f'Restaurant with id {restaurant_id} does not exist.'}, status=status.HTTP_404_NOT_FOUND)
-            except ValueError:
-                return Response({'error': f'Restaurant_id must be int.'}, status=status.HTTP_400_BAD_REQUEST)
-            queryset = queryset.filter(Restaurant=restaurant)
-        if user_id:
-            try:
-                user = User.objects.get(id=int(user_id))
-            except Restaurant.DoesNotExist:
-                return Response({'error': f'User with id {user_id} does not exist.'}, status=status.HTTP_404_NOT_FOUND)
-            except ValueError:
-                return Response({'error': f'User_id must be int.'}, status=status.HTTP_400_BAD_REQUEST)
-            queryset = queryset.filter(user=user)
-        return Response({'comment': CommentSerializer(queryset, many=True).data}, status=status.HTTP_200_OK)
+        try:
+            filters = CommentFilters.from_request(request)
+        except FilterError as e:
+            return Response({'error': e.message}, status=status.HTTP_400_BAD_REQUEST)
+        if filters.restaurant_id and not Restaurant.objects.filter(id=filters.restaurant_id).exists():
+            return Response({'error': f'Restaurant with id {filters.restaurant_id} does not exist.'}, status=status.HTTP_404_NOT_FOUND)
+        if filters.user_id and not User.objects.filter(id=filters.user_id).exists():
+            return Response({'error': f'User with id {filters.user_id} does not exist.'}, status=status.HTTP_404_NOT_FOUND)
+        queryset = filters.apply(CommentSerializer.setup_eager_loading(Comment.objects.all()))
+        if self.values_serializer:
+            data = self.values_serializer.to_representation(self.paginate_queryset(self.values_serializer.values(queryset)))
+        else:
+            data = CommentSerializer(self.paginate_queryset(queryset), many=True).data
+        return Response(self.paginator.get_paginated_data('comment', data), status=status.HTTP_200_OK)
     
     def create(self, request, *args, **kwargs):
         if not request.user.is_authenticated:
@@ -421,8 +448,10 @@ class CommentView(generics.ListCreateAPIView):
         if not give_point:
             return Response({'error': 'Point is required.'}, status=status.HTTP_400_BAD_REQUEST)
         try:
-            give_point = float(give_point)
-        except ValueError:
+            give_point = Decimal(str(give_point)).quantize(Decimal('0.1'))
+            if not give_point.is_finite():
+                raise InvalidOperation
+        except InvalidOperation:
             return Response({'error': f'Give_point must be float.'}, status=status.HTTP_400_BAD_REQUEST)
         if give_point < 0 or give_point > 5:
             return Response({'error': 'Point must be between 0 to 5'}, status=status.HTTP_400_BAD_REQUEST)
@@ -438,27 +467,25 @@ class CommentView(generics.ListCreateAPIView):
             return Response({'error': f'Food with id {food_id} does not exist.'}, status=status.HTTP_404_NOT_FOUND)
         except ValueError:
             return Response({'error': f'Food_id must be int.'}, status=status.HTTP_400_BAD_REQUEST)
-        comment = Comment.objects.create(
-            user = request.user,
-            food = food,
-            restaurant = restaurant,
-            comment = comment,
-            give_point = give_point
-        )
-        no_of_comment = food.no_of_comment
-        food.ave_point = (float(food.ave_point)*no_of_comment + give_point)/(no_of_comment+1)
-        food.no_of_comment = no_of_comment + 1
-        food.save()
+        with transaction.atomic():
+            comment = Comment.objects.create(
+                user = request.user,
+                food = food,
+                restaurant = restaurant,
+                comment = comment,
+                give_point = give_point
+            )
+            enqueue_rating(comment, 1)
         return Response({'comment': CommentSerializer(comment).data, 'message': 'success'}, status=status.HTTP_201_CREATED)
         
 class SingleCommentView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = CommentSerializer
     permission_classes = [IsAuthenticated]
-    queryset = Comment.objects.all()
+    queryset = CommentSerializer.setup_eager_loading(Comment.objects.all())
 
     def update(self, request, *args, **kwargs):
         comment_object = self.get_object()
-        if request.user != comment_object.user:
+        if request.user.id != comment_object.user_id:
             return Response({'error': 'Only writer can edit.'}, status=status.HTTP_403_FORBIDDEN)
         comment = request.data.get('comment', None)
         if comment:
@@ -468,15 +495,40 @@ class SingleCommentView(generics.RetrieveUpdateDestroyAPIView):
     
     def delete(self, request, *args, **kwargs):
         comment = self.get_object()
-        food = comment.food
-        give_point = float(comment.give_point)
-        if not request.user.is_superuser and (request.user != comment.user) :
+        if not request.user.is_superuser and (request.user.id != comment.user_id) :
             return Response({'error': 'Only superuser or writer can delete restaurants.'}, status=status.HTTP_403_FORBIDDEN)
-        no_of_comment = food.no_of_comment
-        food.ave_point = (float(food.ave_point)*no_of_comment - give_point)/(no_of_comment-1)
-        food.no_of_comment = no_of_comment - 1
-        food.save()
-        return super().delete(request, *args, **kwargs)
+        with transaction.atomic():
+            deleted, _ = Comment.objects.filter(id=comment.id).delete()
+            if deleted:
+                enqueue_rating(comment, -1)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class SearchView(APIView):
+    permission_classes = []
+    serializers = {
+        'food': FoodSerializer,
+        'type': TypeByFoodSerializer,
+        'comment': CommentSerializer,
+    }
+
+    def get(self, request):
+        query = request.query_params.get('q', None)
+        kind = request.query_params.get('kind', 'food')
+        limit = request.query_params.get('limit', 20)
+        if not query:
+            return Response({'error': 'q is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        if kind not in SEARCH_FIELDS:
+            return Response({'error': f'kind must be one of {", ".join(SEARCH_FIELDS)}.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            # At least 1: SQLite reads LIMIT -1 as no limit.
+            limit = max(1, min(int(limit), 100))
+        except ValueError:
+            return Response({'error': 'limit must be int.'}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = self.serializers[kind]
+        results = get_search_backend().search(kind, query, limit)
+        if issubclass(serializer, EagerLoadingMixin):
+            serializer.load_related(results)
+        return Response({kind: serializer(results, many=True).data}, status=status.HTTP_200_OK)
 
 class UnavailableView(generics.ListCreateAPIView):
     queryset = Unavailable.objects.all()
@@ -496,4 +548,18 @@ class SingleUnavailableView(generics.RetrieveUpdateDestroyAPIView):
     def delete(self, request, *args, **kwargs):
         if not request.user.is_superuser:
             return Response({'error': 'Only superuser can delete.'}, status=status.HTTP_403_FORBIDDEN)
-        return super().delete(request, *args, **kwargs)
\ No newline at end of file
+        return super().delete(request, *args, **kwargs)
+
+class ProfilingView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        if not request.user.is_superuser:
+            return Response({'error': 'Only superuser can view profiling.'}, status=status.HTTP_403_FORBIDDEN)
+        return Response({'routes': report(profile_store.snapshot()), 'token_cache': token_cache.stats()}, status=status.HTTP_200_OK)
+
+    def delete(self, request):
+        if not request.user.is_superuser:
+            return Response({'error': 'Only superuser can reset profiling.'}, status=status.HTTP_403_FORBIDDEN)
+        profile_store.reset()
+        return Response({'message': 'success'}, status=status.HTTP_200_OK)
\ No newline at end of file
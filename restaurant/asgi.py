@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'restaurant.settings')
 
 application = get_asgi_application()
+
+# Worker threads for the background tasks of this process.
+from api_endpoint.tasks import task_pool
+
+task_pool.start()
@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+import django
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -44,6 +47,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api_endpoint.profiling.ProfilingMiddleware',
+    'api_endpoint.routers.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -77,13 +82,102 @@ WSGI_APPLICATION = 'restaurant.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# SQLite by default. DJANGO_DB_ENGINE=postgresql switches to PostgreSQL,
+# configured from DJANGO_DB_NAME/USER/PASSWORD/HOST/PORT. DJANGO_DB_POOL=1
+# uses psycopg's connection pool (pip install "psycopg[pool]") instead of
+# persistent connections kept for DJANGO_DB_CONN_MAX_AGE seconds.
+# Connection pools and SQLite's transaction_mode need Django 5.1; older
+# versions keep persistent connections and SQLite's deferred transactions.
+
+DB_OPTIONS_5_1 = django.VERSION >= (5, 1)
+
+DB_ENGINE = os.environ.get('DJANGO_DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgresql':
+    DB_POOL = DB_OPTIONS_5_1 and os.environ.get('DJANGO_DB_POOL', '') == '1'
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DJANGO_DB_NAME', 'restaurant'),
+            'USER': os.environ.get('DJANGO_DB_USER', ''),
+            'PASSWORD': os.environ.get('DJANGO_DB_PASSWORD', ''),
+            'HOST': os.environ.get('DJANGO_DB_HOST', ''),
+            'PORT': os.environ.get('DJANGO_DB_PORT', ''),
+            # Django refuses persistent connections on top of a pool.
+            'CONN_MAX_AGE': 0 if DB_POOL else int(os.environ.get('DJANGO_DB_CONN_MAX_AGE', 60)),
+            # Test a reused connection before the request that picks it up.
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.environ.get('DJANGO_DB_POOL_MIN_SIZE', 2)),
+                    'max_size': int(os.environ.get('DJANGO_DB_POOL_MAX_SIZE', 20)),
+                    'timeout': int(os.environ.get('DJANGO_DB_POOL_TIMEOUT', 10)),
+                },
+            } if DB_POOL else {},
+        }
+    }
+elif DB_ENGINE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DJANGO_DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                # Seconds a writer waits for the lock before "database is locked".
+                'timeout': int(os.environ.get('DJANGO_DB_BUSY_TIMEOUT', 20)),
+                # Take the write lock at BEGIN so two read-then-write
+                # transactions cannot deadlock upgrading their locks.
+                **({'transaction_mode': 'IMMEDIATE'} if DB_OPTIONS_5_1 else {}),
+                # WAL lets readers run alongside the writer; NORMAL only
+                # fsyncs at checkpoints, which WAL keeps crash-safe.
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'
+                    f'PRAGMA mmap_size={int(os.environ.get("DJANGO_DB_MMAP_SIZE", 256*1024*1024))};'
+                    'PRAGMA temp_store=MEMORY;'
+                ),
+            },
+        }
     }
+else:
+    raise ValueError(f'DJANGO_DB_ENGINE must be sqlite or postgresql, not {DB_ENGINE!r}.')
+
+# Read replicas: DJANGO_DB_REPLICAS lists copies of the primary (SQLite
+# files, or PostgreSQL hosts with the primary's other settings). Safe
+# requests read from them unless the client wrote in the last
+# REPLICA_PIN_SECONDS; tests read the primary.
+
+DATABASE_REPLICAS = []
+for replica in filter(None, (value.strip() for value in os.environ.get('DJANGO_DB_REPLICAS', '').split(','))):
+    alias = f'replica{len(DATABASE_REPLICAS)+1}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        ('NAME' if DB_ENGINE == 'sqlite' else 'HOST'): replica,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['api_endpoint.routers.ReplicaRouter']
+REPLICA_PIN_SECONDS = 5
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'menu': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'menu',
+        'TIMEOUT': 60*60,
+    },
 }
 
+# The availability index of each process follows changes made by other
+# processes within this many seconds, even with the per-process cache above.
+AVAILABILITY_INDEX_TTL = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -132,19 +226,67 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.DjangoModelPermissionsOrAnonReadOnly'
     ],
+    # orjson-backed when installed, stock JSON output otherwise.
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
-        'rest_framework.renderers.BrowsableAPIRenderer',
+        'api_endpoint.renderers.FastJSONRenderer',
         # 'rest_framework.renderers.XMLRenderer',
+    ] + (['rest_framework.renderers.BrowsableAPIRenderer'] if DEBUG else []),
+    'DEFAULT_PARSER_CLASSES': [
+        'api_endpoint.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
+    # Tokens are tried first, so a token request never reads the session.
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'api_endpoint.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ),
 
 }
 
+# Cache-Control max-age of the restaurant and menu list responses
+
+API_CACHE_MAX_AGE = 60
+
+# Per-restaurant menu snapshots (/api/restaurant/<id>/menu) are patched
+# on read and rebuilt in full once older than this many seconds.
+
+MENU_SNAPSHOT_MAX_AGE = 60*60
+
+# Token -> user cache of CachedTokenAuthentication (per process); hit rate
+# is reported by /api/profiling.
+
+TOKEN_CACHE_SIZE = 10000
+TOKEN_CACHE_TTL = 60
+
+# Request profiling (SQL count/time, render time, latency per route)
+
+PROFILING = os.environ.get('DJANGO_PROFILING', '') == '1'
+PROFILING_DIR = BASE_DIR / 'profiling'
+PROFILING_FLUSH_INTERVAL = 10
+PROFILING_N_PLUS_ONE_THRESHOLD = 5
+
 DJOSER = {
     'USER_ID_FIELD': 'username',
     # 'LOGIN_FEILD': 'email',
 }
+
+# Table/order event streams (/api/events, served under ASGI). The default
+# broker only reaches streams of the same process; set EVENT_BROKER to a
+# LocalBroker subclass backed by a shared bus when running several.
+
+EVENT_BROKER = os.environ.get('DJANGO_EVENT_BROKER') or None
+EVENT_HEARTBEAT_SECONDS = 15
+
+# Background tasks (api_endpoint/tasks.py): rating aggregates and order
+# completion side effects. TASK_WORKERS threads of each web process run
+# them, which keeps the per-process menu cache, table index and event
+# broker current. With DJANGO_TASK_WORKERS=0, run `manage.py run_tasks`
+# instead (only with shared caches and a shared EVENT_BROKER).
+
+TASK_WORKERS = int(os.environ.get('DJANGO_TASK_WORKERS', 2))
+TASK_POLL_SECONDS = 1
+TASK_LEASE_SECONDS = 60
+TASK_MAX_ATTEMPTS = 5
+TASK_RETRY_DELAY = 5
+TASK_RETENTION = 7*24*60*60
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'restaurant.settings')
 
 application = get_wsgi_application()
+
+# Worker threads for the background tasks of this process.
+from api_endpoint.tasks import task_pool
+
+task_pool.start()